@@ -0,0 +1,197 @@
+"""Асинхронные представления чтения рецептов, тегов, ингредиентов
+и коротких ссылок для ASGI приложения (см. ASGI_URLCONF).
+
+Объекты читаются асинхронными методами ORM, фильтрация,
+аутентификация и сериализация, которые могут обращаться к БД
+синхронно, выполняются через sync_to_async. Ответы совпадают
+с ответами представлений DRF в формате JSON.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponseNotAllowed
+from django.urls import resolve
+from django.views import View
+from rest_framework.exceptions import NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+
+from recipes.models import Recipe, Ingredient, Tag
+from .authentication import CachedTokenAuthentication
+from .indexes import ingredient_index
+from .mixins import AsyncVersionedCacheMixin
+from .serializers import (
+    RecipeReadSerializer, IngredientSerializer, TagSerializer
+)
+from .utils import annotate_recipes, get_short_url_redirect
+from .views import RecipeViewSet
+
+
+class AsyncReadView(View):
+    """Базовое асинхронное представление чтения.
+
+    Запросы GET и HEAD обрабатываются асинхронно, остальные
+    передаются синхронному представлению DRF того же маршрута
+    из ROOT_URLCONF.
+    """
+
+    read_methods = ('GET', 'HEAD')
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Как и у представлений DRF, CSRF проверяется аутентификацией.
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in self.read_methods:
+            match = resolve(request.path_info, urlconf=settings.ROOT_URLCONF)
+            return await sync_to_async(match.func)(
+                request, *match.args, **match.kwargs
+            )
+        request = self.initialize_request(request)
+        try:
+            await sync_to_async(self.authenticate)(request)
+            response = await super().dispatch(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(request, exc)
+        return self.finalize_response(request, response)
+
+    @staticmethod
+    def initialize_request(request):
+        return Request(
+            request, authenticators=(CachedTokenAuthentication(),)
+        )
+
+    @staticmethod
+    def authenticate(request):
+        return request.user
+
+    def handle_exception(self, request, exc):
+        if isinstance(exc, Http404):
+            exc = NotFound()
+        if getattr(exc, 'status_code', None) == 401:
+            exc.auth_header = CachedTokenAuthentication().authenticate_header(
+                request
+            )
+        response = exception_handler(exc, {'view': self})
+        if response is None:
+            raise exc
+        return response
+
+    def finalize_response(self, request, response):
+        if isinstance(response, Response):
+            response.accepted_renderer = JSONRenderer()
+            response.accepted_media_type = JSONRenderer.media_type
+            response.renderer_context = {
+                'view': self, 'request': request, 'response': response
+            }
+        return response
+
+
+class RecipeListView(AsyncReadView):
+    """Список рецептов.
+
+    Фильтрация и пагинация настраиваются так же, как в RecipeViewSet.
+    """
+
+    filter_backends = RecipeViewSet.filter_backends
+    filterset_class = RecipeViewSet.filterset_class
+    pagination_class = RecipeViewSet.pagination_class
+
+    def filter_queryset(self, request, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(request, queryset, self)
+        return queryset
+
+    @staticmethod
+    def serialize(recipes, request):
+        return RecipeReadSerializer(
+            recipes, many=True, context={'request': request}
+        ).data
+
+    async def get(self, request):
+        queryset = await sync_to_async(self.filter_queryset)(
+            request, annotate_recipes(Recipe.objects.all(), request.user)
+        )
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(queryset, request, self)
+        return paginator.get_paginated_response(
+            await sync_to_async(self.serialize)(page, request)
+        )
+
+
+class RecipeDetailView(AsyncReadView):
+    """Рецепт."""
+
+    @staticmethod
+    def serialize(recipe, request):
+        return RecipeReadSerializer(
+            recipe, context={'request': request}
+        ).data
+
+    async def get(self, request, pk):
+        try:
+            recipe = await annotate_recipes(
+                Recipe.objects.all(), request.user
+            ).aget(pk=pk)
+        except Recipe.DoesNotExist:
+            raise NotFound()
+        return Response(await sync_to_async(self.serialize)(recipe, request))
+
+
+class TagListView(AsyncVersionedCacheMixin, AsyncReadView):
+    """Список тегов."""
+
+    cache_models = (Tag,)
+
+    async def get(self, request):
+        return Response(TagSerializer(
+            [tag async for tag in Tag.objects.all()], many=True
+        ).data)
+
+
+class TagDetailView(AsyncVersionedCacheMixin, AsyncReadView):
+    """Тег."""
+
+    cache_models = (Tag,)
+
+    async def get(self, request, pk):
+        try:
+            return Response(TagSerializer(await Tag.objects.aget(pk=pk)).data)
+        except Tag.DoesNotExist:
+            raise NotFound()
+
+
+class IngredientListView(AsyncVersionedCacheMixin, AsyncReadView):
+    """Список ингредиентов с поиском по началу названия."""
+
+    cache_models = (Ingredient,)
+
+    async def get(self, request):
+        return Response(await sync_to_async(ingredient_index.search)(
+            request.query_params.get('name')
+        ))
+
+
+class IngredientDetailView(AsyncVersionedCacheMixin, AsyncReadView):
+    """Ингредиент."""
+
+    cache_models = (Ingredient,)
+
+    async def get(self, request, pk):
+        try:
+            return Response(IngredientSerializer(
+                await Ingredient.objects.aget(pk=pk)
+            ).data)
+        except Ingredient.DoesNotExist:
+            raise NotFound()
+
+
+async def get_short_url(request, code=None, pk=None):
+    """Переход по короткой ссылке на рецепт."""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(('GET',))
+    return await sync_to_async(get_short_url_redirect)(code, pk)
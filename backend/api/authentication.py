@@ -0,0 +1,121 @@
+import copy
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.constants import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL
+from recipes.models import User
+from recipes.utils import COUNTERS, get_object_versions
+
+# Счетчики пользователя меняются запросами UPDATE с F(). Пользователь
+# из кэша загружается без них, и save() не перезаписывает их старыми
+# значениями: Django сохраняет только загруженные поля.
+USER_COUNTER_FIELDS = tuple(
+    f'user__{counter}'
+    for model, counter, *related in COUNTERS if model is User
+)
+
+
+def get_token_versions(key, user_id):
+    """Версии токена и его пользователя. Версия токена обновляется
+    при его удалении, версия пользователя - при сохранении
+    (см. recipes.signals).
+    """
+    return tuple(get_object_versions(
+        ((Token, key), (User, user_id))
+    ).values())
+
+
+class TokenCache:
+    """Ограниченный LRU кэш токенов со временем жизни записей.
+
+    Запись действительна, пока не изменились версии токена
+    и пользователя: выход пользователя, смена пароля и деактивация
+    сбрасывают только записи этого пользователя.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.hits = self.misses = 0
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+        # Версии читаются из общего кэша вне блокировки.
+        if item is not None and item[0] >= time.monotonic() and (
+            item[1] == get_token_versions(key, item[2][0].pk)
+        ):
+            with self.lock:
+                if key in self.items:
+                    self.items.move_to_end(key)
+                self.hits += 1
+            return item[2]
+        with self.lock:
+            self.items.pop(key, None)
+            self.misses += 1
+        return None
+
+    def set(self, key, value, versions):
+        """Сохранение записи. Версии читаются до загрузки value,
+        поэтому изменение во время загрузки делает запись устаревшей.
+        """
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.ttl, versions, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'size': len(self.items),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / requests if requests else 0.0,
+        }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену с кэшированием пользователя в памяти."""
+
+    def load_versions(self, key):
+        """Версии токена и пользователя до загрузки пользователя."""
+        user_id = Token.objects.filter(key=key).values_list(
+            'user_id', flat=True
+        ).first()
+        if user_id is None:
+            raise AuthenticationFailed(_('Invalid token.'))
+        return get_token_versions(key, user_id)
+
+    def load_credentials(self, key):
+        """Запрос TokenAuthentication без счетчиков пользователя."""
+        try:
+            token = Token.objects.select_related('user').defer(
+                *USER_COUNTER_FIELDS
+            ).get(key=key)
+        except Token.DoesNotExist:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return token.user, token
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            versions = self.load_versions(key)
+            cached = self.load_credentials(key)
+            token_cache.set(key, cached, versions)
+        user, token = cached
+        return copy.copy(user), token
@@ -0,0 +1,135 @@
+"""Экспорт списка покупок в файлы различных форматов."""
+import csv
+import os
+from abc import ABC, abstractmethod
+from functools import lru_cache, partial
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from core.constants import (
+    SHOPPING_LIST_CHUNK_SIZE, PDF_FONT_NAME, PDF_FONT_SIZE,
+    PDF_MARGIN, PDF_LINE_HEIGHT
+)
+
+
+class BaseShoppingListExporter(ABC):
+    """Базовый класс экспорта списка покупок.
+
+    Экземпляр является итератором по частям файла и передается
+    в StreamingHttpResponse.
+    """
+
+    format = None
+    content_type = None
+
+    def __init__(self, ingredients):
+        self.ingredients = ingredients
+
+    @abstractmethod
+    def __iter__(self):
+        """Части файла."""
+
+    def get_rows(self):
+        for number, ingredient in enumerate(
+            self.ingredients.iterator(), start=1
+        ):
+            yield (
+                number,
+                ingredient.get('ingredient__name').capitalize(),
+                ingredient.get('total_amount'),
+                ingredient.get('ingredient__measurement_unit')
+            )
+
+    def get_lines(self):
+        for number, name, amount, measurement_unit in self.get_rows():
+            yield f'{number}.{name} - {amount} ({measurement_unit})'
+
+
+class TxtShoppingListExporter(BaseShoppingListExporter):
+    """Экспорт списка покупок в текстовый файл."""
+
+    format = 'txt'
+    content_type = 'text/plain; charset=UTF-8'
+
+    def __iter__(self):
+        for line in self.get_lines():
+            yield f'{line}\n'
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанное значение."""
+
+    def write(self, value):
+        return value
+
+
+class CsvShoppingListExporter(BaseShoppingListExporter):
+    """Экспорт списка покупок в CSV файл."""
+
+    format = 'csv'
+    content_type = 'text/csv; charset=UTF-8'
+
+    def __iter__(self):
+        writer = csv.writer(Echo())
+        yield '\ufeff' + writer.writerow(
+            ('№', 'Ингредиент', 'Количество', 'Единица измерения')
+        )
+        for row in self.get_rows():
+            yield writer.writerow(row)
+
+
+@lru_cache(maxsize=None)
+def get_pdf_font():
+    """Регистрация шрифта с поддержкой кириллицы."""
+    font_path = settings.SHOPPING_LIST_PDF_FONT
+    if not os.path.exists(font_path):
+        return 'Helvetica'
+    pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+    return PDF_FONT_NAME
+
+
+class PdfShoppingListExporter(BaseShoppingListExporter):
+    """Экспорт списка покупок в PDF файл.
+
+    Таблица перекрестных ссылок PDF записывается в конце документа,
+    поэтому файл собирается во временном файле и отдается частями.
+    """
+
+    format = 'pdf'
+    content_type = 'application/pdf'
+
+    def __iter__(self):
+        with SpooledTemporaryFile(max_size=SHOPPING_LIST_CHUNK_SIZE) as file:
+            self.draw(file)
+            file.seek(0)
+            yield from iter(partial(file.read, SHOPPING_LIST_CHUNK_SIZE), b'')
+
+    def draw(self, file):
+        font = get_pdf_font()
+        _, height = A4
+        pdf = canvas.Canvas(file, pagesize=A4)
+        pdf.setTitle('Список покупок')
+        pdf.setFont(font, PDF_FONT_SIZE)
+        y = height - PDF_MARGIN
+        for line in self.get_lines():
+            if y < PDF_MARGIN:
+                pdf.showPage()
+                pdf.setFont(font, PDF_FONT_SIZE)
+                y = height - PDF_MARGIN
+            pdf.drawString(PDF_MARGIN, y, line)
+            y -= PDF_LINE_HEIGHT
+        pdf.save()
+
+
+SHOPPING_LIST_EXPORTERS = {
+    exporter.format: exporter for exporter in (
+        TxtShoppingListExporter,
+        CsvShoppingListExporter,
+        PdfShoppingListExporter
+    )
+}
@@ -1,29 +1,63 @@
-from rest_framework.filters import SearchFilter
+from django import forms
+from django.db.models import (
+    BigIntegerField, Exists, ExpressionWrapper, F, OuterRef, Q
+)
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import User, Recipe, Tag
+from core.constants import TAGS_MASK_BITS
+from recipes.models import User, Recipe, FavoriteRecipe, ShoppingCart
+from recipes.search import search_recipes
+from recipes.utils import get_tags_mask
+from .indexes import tag_index
 
+TAGS_MATCH_ANY = 'any'
+TAGS_MATCH_ALL = 'all'
+TAGS_MATCH_CHOICES = (
+    (TAGS_MATCH_ANY, 'Любой из тегов'),
+    (TAGS_MATCH_ALL, 'Все теги'),
+)
 
-class IngredientFilter(SearchFilter):
-    """Фильтр ингредиентов."""
 
-    search_param = 'name'
+class MultipleValueField(forms.MultipleChoiceField):
+    """Список значений без проверки по списку вариантов."""
+
+    def valid_value(self, value):
+        return True
+
+
+class MultipleValueFilter(filters.MultipleChoiceFilter):
+    """Фильтр по повторяющемуся параметру запроса."""
+
+    field_class = MultipleValueField
 
 
 class RecipeFilter(FilterSet):
-    """Фильтр рецептов."""
+    """Фильтр рецептов.
+
+    Теги, избранное и корзина проверяются через битовую маску
+    тегов и подзапросы EXISTS, без JOIN, размножающих строки.
+    Результаты поиска сортируются по релевантности, если не задан
+    параметр ordering.
+    """
 
     author = filters.ModelChoiceFilter(
         queryset=User.objects.all(),
         field_name='author',
         label='Автор'
     )
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
+    tags = MultipleValueFilter(
+        method='filter_tags',
         label='Теги'
     )
+    tags_match = filters.ChoiceFilter(
+        choices=TAGS_MATCH_CHOICES,
+        method='filter_tags_match',
+        label='Совпадение тегов'
+    )
+    search = filters.CharFilter(
+        method='filter_search',
+        label='Поиск'
+    )
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited',
         label='Избранные рецепты'
@@ -32,19 +66,66 @@ class RecipeFilter(FilterSet):
         method='filter_is_in_shopping_cart',
         label='Рецепты в корзине'
     )
+    ordering = filters.OrderingFilter(
+        fields=('pub_date', 'favorites_count'),
+        label='Сортировка'
+    )
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author', 'tags', 'tags_match', 'search',
+            'is_favorited', 'is_in_shopping_cart', 'ordering'
+        )
+
+    def filter_tags(self, queryset, name, slugs):
+        """Рецепты с любым (tags_match=any, по умолчанию)
+        или со всеми (tags_match=all) указанными тегами.
+        """
+        match_all = self.form.cleaned_data.get('tags_match') == TAGS_MATCH_ALL
+        tag_ids = tag_index.get_ids(slugs)
+        if not tag_ids or match_all and len(tag_ids) < len(set(slugs)):
+            return queryset.none()
+        mask = get_tags_mask(tag_ids)
+        queryset = queryset.alias(tags_bits=ExpressionWrapper(
+            F('tags_mask').bitand(mask), output_field=BigIntegerField()
+        ))
+        # Теги, не вошедшие в маску, проверяются подзапросами.
+        other_ids = [tag_id for tag_id in tag_ids if tag_id >= TAGS_MASK_BITS]
+        if match_all:
+            conditions = [Q(tags_bits=mask)] if mask else []
+            conditions.extend(
+                Exists(Recipe.tags.through.objects.filter(
+                    recipe=OuterRef('pk'), tag_id=tag_id
+                )) for tag_id in other_ids
+            )
+            return queryset.filter(*conditions)
+        condition = Q(tags_bits__gt=0) if mask else Q()
+        if other_ids:
+            condition |= Q(Exists(Recipe.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag_id__in=other_ids
+            )))
+        return queryset.filter(condition)
+
+    def filter_tags_match(self, queryset, name, value):
+        # Учитывается в filter_tags.
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(recipes_in_favorite__user=user)
+            return queryset.filter(Exists(FavoriteRecipe.objects.filter(
+                recipe=OuterRef('pk'), user=user
+            )))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(recipes_in_cart__user=user)
+            return queryset.filter(Exists(ShoppingCart.objects.filter(
+                recipe=OuterRef('pk'), user=user
+            )))
         return queryset
@@ -0,0 +1,118 @@
+"""Обработка загруженных изображений вне цикла запроса."""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from core.constants import (
+    AVATAR_MAX_SIZE, IMAGE_VARIANTS, IMAGE_VARIANT_QUALITY,
+    IMAGE_PROCESSING_WORKERS
+)
+from recipes.utils import bump_object_version, delete_image_variants
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=IMAGE_PROCESSING_WORKERS,
+    thread_name_prefix='image-processing'
+)
+
+
+def create_image_variants(name):
+    """Создание уменьшенных копий изображения в формате WebP."""
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    variants = {}
+    with default_storage.open(name) as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        for variant, size in IMAGE_VARIANTS.items():
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, 'WEBP', quality=IMAGE_VARIANT_QUALITY)
+            variants[variant] = default_storage.save(
+                f'{directory}/variants/{stem}_{variant}.webp',
+                ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def downscale_image(name, size):
+    """Уменьшение изображения до size с сохранением по тому же пути.
+
+    Возвращает имя сохранённого файла или None, если изображение
+    уже не больше size.
+    """
+    with default_storage.open(name) as file, Image.open(file) as image:
+        image_format = image.format
+        image = ImageOps.exif_transpose(image)
+        if image.width <= size[0] and image.height <= size[1]:
+            return None
+        image.thumbnail(size, Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, image_format, quality=IMAGE_VARIANT_QUALITY)
+    default_storage.delete(name)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def process_avatar(model, pk, field_name, name):
+    try:
+        saved = downscale_image(name, AVATAR_MAX_SIZE)
+        if saved and saved != name and model.objects.filter(
+            pk=pk, **{field_name: name}
+        ).update(**{field_name: saved}):
+            bump_object_version(model, pk)
+    except Exception:
+        logger.exception('Ошибка обработки изображения %s', name)
+    finally:
+        connection.close()
+
+
+def process_image(model, pk, field_name, variants_field, name, old_variants):
+    try:
+        variants = create_image_variants(name)
+        updated = model.objects.filter(
+            pk=pk, **{field_name: name}
+        ).update(**{variants_field: variants})
+        if updated:
+            bump_object_version(model, pk)
+        # Изображение успели заменить, варианты уже не нужны.
+        delete_image_variants(old_variants if updated else variants)
+    except Exception:
+        logger.exception('Ошибка обработки изображения %s', name)
+    finally:
+        connection.close()
+
+
+def schedule_image_processing(instance, field_name, variants_field):
+    """Постановка изображения в очередь на обработку
+    после фиксации транзакции.
+    """
+    name = getattr(instance, field_name).name
+    old_variants = getattr(instance, variants_field)
+    setattr(instance, variants_field, {})
+    type(instance).objects.filter(pk=instance.pk).update(
+        **{variants_field: {}}
+    )
+    bump_object_version(type(instance), instance.pk)
+    transaction.on_commit(lambda: executor.submit(
+        process_image, type(instance), instance.pk,
+        field_name, variants_field, name, old_variants
+    ))
+
+
+def schedule_avatar_processing(instance, field_name):
+    """Постановка аватара в очередь на уменьшение
+    после фиксации транзакции.
+    """
+    name = getattr(instance, field_name).name
+    transaction.on_commit(lambda: executor.submit(
+        process_avatar, type(instance), instance.pk, field_name, name
+    ))
@@ -0,0 +1,99 @@
+"""Индексы справочников в памяти процесса."""
+import sys
+from bisect import bisect_left
+from itertools import islice
+from threading import Lock
+
+from core.constants import INGREDIENT_SEARCH_LIMIT
+from recipes.models import Ingredient, Tag
+from recipes.utils import get_model_version
+from .serializers import IngredientSerializer
+
+
+class IngredientIndex:
+    """Индекс ингредиентов для поиска по началу и части названия.
+
+    Ингредиенты хранятся отсортированными по названию в нижнем
+    регистре: совпадения по началу названия находятся бинарным
+    поиском, совпадения по части названия - перебором. Индекс
+    перестраивается при изменении версии данных модели Ingredient.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.keys = []
+        self.ingredients = []
+        self.lock = Lock()
+
+    def refresh(self):
+        version = get_model_version(Ingredient)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            ingredients = sorted(
+                IngredientSerializer(
+                    Ingredient.objects.all(), many=True
+                ).data,
+                key=lambda ingredient: (
+                    ingredient['name'].lower(), ingredient['id']
+                )
+            )
+            self.keys = [
+                ingredient['name'].lower() for ingredient in ingredients
+            ]
+            self.ingredients = ingredients
+            self.version = version
+
+    def search(self, name=None, limit=INGREDIENT_SEARCH_LIMIT):
+        """Поиск ингредиентов: сначала по началу названия,
+        затем по части названия.
+        """
+        self.refresh()
+        keys, ingredients = self.keys, self.ingredients
+        if not name:
+            return ingredients
+        name = name.lower()
+        start = bisect_left(keys, name)
+        end = bisect_left(keys, name + chr(sys.maxunicode), lo=start)
+        result = ingredients[start:min(end, start + limit)]
+        infix = (
+            ingredient for key, ingredient in zip(keys, ingredients)
+            if name in key and not key.startswith(name)
+        )
+        return result + list(islice(infix, limit - len(result)))
+
+
+ingredient_index = IngredientIndex()
+
+
+class TagIndex:
+    """Соответствие слагов тегов их id для фильтрации рецептов
+    без запроса к таблице тегов. Перестраивается при изменении
+    версии данных модели Tag.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.ids = {}
+        self.lock = Lock()
+
+    def refresh(self):
+        version = get_model_version(Tag)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            self.ids = dict(Tag.objects.values_list('slug', 'id'))
+            self.version = version
+
+    def get_ids(self, slugs):
+        """id существующих тегов из списка слагов."""
+        self.refresh()
+        ids = self.ids
+        return [ids[slug] for slug in dict.fromkeys(slugs) if slug in ids]
+
+
+tag_index = TagIndex()
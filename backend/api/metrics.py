@@ -0,0 +1,172 @@
+"""Гистограммы стоимости запросов в формате Prometheus.
+
+Каждый процесс накапливает метрики в памяти и периодически сохраняет
+их снимок в общий кэш, откуда эндпоинт метрик собирает и суммирует
+данные всех воркеров gunicorn.
+"""
+import os
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from threading import Lock
+
+from django.core.cache import cache
+
+from core.constants import (
+    METRICS_DURATION_BUCKETS, METRICS_QUERY_BUCKETS, METRICS_SIZE_BUCKETS,
+    METRICS_FLUSH_INTERVAL, METRICS_WORKER_TIMEOUT
+)
+from .authentication import token_cache
+
+WORKERS_KEY = 'metrics:workers'
+HISTOGRAMS = {
+    'foodgram_request_duration_seconds': (
+        'Время обработки запроса', METRICS_DURATION_BUCKETS
+    ),
+    'foodgram_request_queries': (
+        'Количество SQL запросов', METRICS_QUERY_BUCKETS
+    ),
+    'foodgram_request_sql_duration_seconds': (
+        'Суммарное время SQL запросов', METRICS_DURATION_BUCKETS
+    ),
+    'foodgram_response_size_bytes': (
+        'Размер ответа', METRICS_SIZE_BUCKETS
+    ),
+}
+COUNTERS = {
+    'foodgram_query_budget_exceeded_total': (
+        'Количество запросов, превысивших бюджет SQL запросов'
+    ),
+    'foodgram_token_cache_hits_total': 'Попадания в кэш токенов',
+    'foodgram_token_cache_misses_total': 'Промахи кэша токенов',
+}
+
+
+class Metrics:
+    """Метрики текущего процесса."""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.histograms = defaultdict(dict)
+        self.counters = defaultdict(dict)
+        self.flushed_at = 0
+
+    def observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        with self.lock:
+            series = self.histograms[name].setdefault(
+                labels, [[0] * (len(buckets) + 1), 0, 0]
+            )
+            series[0][bisect_left(buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def increment(self, name, labels, value=1):
+        with self.lock:
+            counters = self.counters[name]
+            counters[labels] = counters.get(labels, 0) + value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'histograms': {
+                    name: {
+                        labels: [list(buckets), total, count]
+                        for labels, (buckets, total, count) in series.items()
+                    }
+                    for name, series in self.histograms.items()
+                },
+                'counters': {
+                    name: dict(series)
+                    for name, series in self.counters.items()
+                },
+                'token_cache': token_cache.stats(),
+            }
+
+    def flush(self, force=False):
+        """Сохранение снимка метрик процесса в общий кэш."""
+        now = time.monotonic()
+        if not force and now - self.flushed_at < METRICS_FLUSH_INTERVAL:
+            return
+        self.flushed_at = now
+        key = f'metrics:{os.getpid()}'
+        cache.set(key, self.snapshot(), timeout=METRICS_WORKER_TIMEOUT)
+        workers = cache.get(WORKERS_KEY, set())
+        if key not in workers:
+            cache.set(
+                WORKERS_KEY, workers | {key}, timeout=METRICS_WORKER_TIMEOUT
+            )
+
+
+metrics = Metrics()
+
+
+def collect():
+    """Суммирование снимков метрик всех процессов."""
+    metrics.flush(force=True)
+    snapshots = cache.get_many(cache.get(WORKERS_KEY, set())).values()
+    histograms = defaultdict(dict)
+    counters = defaultdict(lambda: defaultdict(int))
+    for snapshot in snapshots:
+        for name, series in snapshot['histograms'].items():
+            for labels, (buckets, total, count) in series.items():
+                current = histograms[name].get(labels)
+                if current is None:
+                    histograms[name][labels] = [list(buckets), total, count]
+                    continue
+                current[0] = [a + b for a, b in zip(current[0], buckets)]
+                current[1] += total
+                current[2] += count
+        for name, series in snapshot['counters'].items():
+            for labels, value in series.items():
+                counters[name][labels] += value
+        stats = snapshot['token_cache']
+        counters['foodgram_token_cache_hits_total'][()] += stats['hits']
+        counters['foodgram_token_cache_misses_total'][()] += stats['misses']
+    return histograms, counters
+
+
+def format_labels(labels, **extra):
+    labels = (*labels, *extra.items())
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', r'\\').replace('"', r'\"')
+        )
+        for name, value in labels
+    ) + '}'
+
+
+def render():
+    """Вывод метрик в текстовом формате Prometheus."""
+    histograms, counters = collect()
+    lines = []
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+        for labels, (counts, total, count) in sorted(
+            histograms[name].items()
+        ):
+            cumulative = 0
+            for bound, bucket_count in zip(
+                (*buckets, '+Inf'), counts
+            ):
+                cumulative += bucket_count
+                lines.append(
+                    f'{name}_bucket{format_labels(labels, le=bound)} '
+                    f'{cumulative}'
+                )
+            lines.append(f'{name}_sum{format_labels(labels)} {total}')
+            lines.append(f'{name}_count{format_labels(labels)} {count}')
+    for name, description in COUNTERS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+        for labels, value in sorted(counters[name].items()):
+            lines.append(f'{name}{format_labels(labels)} {value}')
+    hits = counters['foodgram_token_cache_hits_total'][()]
+    requests = hits + counters['foodgram_token_cache_misses_total'][()]
+    lines += [
+        '# HELP foodgram_token_cache_hit_ratio Доля попаданий в кэш токенов',
+        '# TYPE foodgram_token_cache_hit_ratio gauge',
+        f'foodgram_token_cache_hit_ratio {hits / requests if requests else 0}'
+    ]
+    return '\n'.join(lines) + '\n'
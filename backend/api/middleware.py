@@ -0,0 +1,163 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async
+)
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from core.constants import METRICS_QUERY_BUDGETS
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """Подсчет количества и времени SQL запросов."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+# Счетчик SQL запросов текущего запроса. Контекст копируется
+# в потоки sync_to_async, поэтому параллельные асинхронные запросы
+# считают только свои SQL запросы.
+query_counter = ContextVar('query_counter', default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    counter = query_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def install_query_counter(connection, **kwargs):
+    """Подключение подсчета запросов к соединению один раз.
+
+    Обертка ставится в начало списка: connection.execute_wrapper()
+    снимает при выходе последнюю обертку, и добавленная в конец
+    во время запроса обертка сняла бы чужую.
+    """
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_query)
+
+
+connection_created.connect(install_query_counter)
+
+
+class RequestMetricsMiddleware:
+    """Сбор времени ответа, количества и времени SQL запросов
+    и размера ответа по именам маршрутов.
+
+    Работает и в синхронном, и в асинхронном режиме. Запросы
+    считаются обработчиком, подключенным к каждому соединению,
+    в счетчик текущего запроса из query_counter.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Соединения, открытые до загрузки middleware.
+        for connection in connections.all(initialized_only=True):
+            install_query_counter(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        token = query_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            query_counter.reset(token)
+        self.record(request, response, time.perf_counter() - start, counter)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        token = query_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            query_counter.reset(token)
+        await sync_to_async(self.record)(
+            request, response, time.perf_counter() - start, counter
+        )
+        return response
+
+    def record(self, request, response, duration, counter):
+        match = request.resolver_match
+        route = match.url_name if match else 'unmatched'
+        if route == 'metrics':
+            return
+        labels = (('route', route), ('method', request.method))
+        metrics.observe('foodgram_request_duration_seconds', labels, duration)
+        metrics.observe('foodgram_request_queries', labels, counter.count)
+        metrics.observe(
+            'foodgram_request_sql_duration_seconds', labels, counter.duration
+        )
+        if response.has_header('Content-Length'):
+            size = int(response['Content-Length'])
+        elif not response.streaming:
+            size = len(response.content)
+        else:
+            size = None
+        if size is not None:
+            metrics.observe('foodgram_response_size_bytes', labels, size)
+        # Бюджеты заданы для чтения: изменения по тому же маршруту
+        # (например, PATCH и DELETE рецепта) выполняют больше запросов.
+        budget = METRICS_QUERY_BUDGETS.get(route)
+        if (
+            budget is not None and request.method == 'GET'
+            and counter.count > budget
+        ):
+            metrics.increment(
+                'foodgram_query_budget_exceeded_total', (('route', route),)
+            )
+            logger.warning(
+                'Маршрут %s выполнил %s SQL запросов при бюджете %s',
+                route, counter.count, budget
+            )
+        metrics.flush()
+
+
+class AsyncRoutesMiddleware:
+    """Подключение маршрутов с асинхронными представлениями
+    (ASGI_URLCONF) для запросов, обрабатываемых через ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.urlconf = settings.ASGI_URLCONF
+        return await self.get_response(request)
@@ -0,0 +1,160 @@
+import gzip
+from hashlib import md5
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.utils.cache import patch_vary_headers
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from core.constants import RESPONSE_CACHE_TIMEOUT
+from recipes.utils import get_model_version
+from .serializers import BulkIdsSerializer
+
+
+class BaseVersionedCacheMixin:
+    """Кэширование ответов на чтение справочников.
+
+    Ответ кэшируется вместе со сжатой gzip копией и привязывается
+    к версиям моделей из cache_models, которые обновляются сигналами
+    при изменении данных. Запрос с актуальным If-None-Match получает
+    ответ 304 без обращения к БД. Кэшируются только ответы в JSON.
+    """
+
+    cache_models = ()
+
+    def get_cache_headers(self, request):
+        """Заголовки ETag и Last-Modified по версии данных."""
+        version = max(
+            get_model_version(model) for model in self.cache_models
+        )
+        etag = '"{}"'.format(md5(
+            f'{version}:{request.get_full_path()}:'
+            f'{request.META.get("HTTP_ACCEPT", "")}'.encode()
+        ).hexdigest())
+        return {
+            'ETag': etag,
+            'Last-Modified': http_date(version // 10 ** 9)
+        }
+
+    @staticmethod
+    def is_not_modified(request, headers):
+        return headers['ETag'] in request.META.get('HTTP_IF_NONE_MATCH', '')
+
+    @staticmethod
+    def get_cache_key(headers):
+        return f'response:{headers["ETag"]}'
+
+    @staticmethod
+    def get_cache_value(response):
+        """Тип и тело ответа со сжатой копией или None, если ответ
+        не кэшируется.
+        """
+        if (
+            response.status_code != 200
+            or response.accepted_renderer.format != 'json'
+        ):
+            return None
+        body = response.render().content
+        return (response['Content-Type'], body, gzip.compress(body))
+
+    @staticmethod
+    def get_cached_response(request, cached, headers):
+        content_type, body, compressed_body = cached
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            body = compressed_body
+            headers['Content-Encoding'] = 'gzip'
+        response = HttpResponse(
+            body, content_type=content_type, headers=headers
+        )
+        patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+        return response
+
+
+class VersionedCacheMixin(BaseVersionedCacheMixin):
+    """Кэширование ответов синхронных представлений.
+
+    Ответ из кэша отдается только после initial(): аутентификации
+    и проверки прав. Если они не пройдены, запрос обрабатывается
+    представлением и получает ответ с ошибкой.
+    """
+
+    def is_allowed(self, request, *args, **kwargs):
+        self.args, self.kwargs = args, kwargs
+        self.request = self.initialize_request(request, *args, **kwargs)
+        try:
+            self.initial(self.request, *args, **kwargs)
+        except APIException:
+            return False
+        return True
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or not self.is_allowed(
+            request, *args, **kwargs
+        ):
+            return super().dispatch(request, *args, **kwargs)
+        headers = self.get_cache_headers(request)
+        if self.is_not_modified(request, headers):
+            return HttpResponseNotModified(headers=headers)
+        key = self.get_cache_key(headers)
+        cached = cache.get(key)
+        if cached is None:
+            response = super().dispatch(request, *args, **kwargs)
+            cached = self.get_cache_value(response)
+            if cached is None:
+                return response
+            cache.set(key, cached, timeout=RESPONSE_CACHE_TIMEOUT)
+        return self.get_cached_response(request, cached, headers)
+
+
+class AsyncVersionedCacheMixin(BaseVersionedCacheMixin):
+    """Кэширование ответов асинхронных представлений (AsyncReadView).
+
+    Как и в VersionedCacheMixin, ответ из кэша отдается только
+    после аутентификации.
+    """
+
+    async def is_allowed(self, request):
+        try:
+            await sync_to_async(self.authenticate)(
+                self.initialize_request(request)
+            )
+        except APIException:
+            return False
+        return True
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or not await self.is_allowed(request):
+            return await super().dispatch(request, *args, **kwargs)
+        headers = await sync_to_async(self.get_cache_headers)(request)
+        if self.is_not_modified(request, headers):
+            return HttpResponseNotModified(headers=headers)
+        key = self.get_cache_key(headers)
+        cached = await cache.aget(key)
+        if cached is None:
+            response = await super().dispatch(request, *args, **kwargs)
+            cached = self.get_cache_value(response)
+            if cached is None:
+                return response
+            await cache.aset(key, cached, timeout=RESPONSE_CACHE_TIMEOUT)
+        return self.get_cached_response(request, cached, headers)
+
+
+class BulkLinksMixin:
+    """Разбор списка id и ответ массовых операций со связями
+    пользователя: избранным, корзиной и подписками.
+    """
+
+    def get_bulk_ids(self):
+        """Уникальные id из тела запроса в исходном порядке."""
+        serializer = BulkIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['ids']))
+
+    @staticmethod
+    def get_bulk_response(statuses):
+        return Response([
+            {'id': pk, 'status': status} for pk, status in statuses.items()
+        ])
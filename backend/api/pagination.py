@@ -1,10 +1,258 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from hashlib import md5
+from operator import or_
 
-from core.constants import PAGE_SIZE
+from django.core.cache import cache
+from django.core.exceptions import (
+    ImproperlyConfigured, ValidationError as DjangoValidationError
+)
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.constants import PAGE_SIZE, CURSOR_COUNT_CACHE_TIMEOUT
+
+
+class CursorLimitPagination(BasePagination):
+    """Класс пагинации по ключу (курсору).
+
+    Ключ страницы - значения полей сортировки queryset, дополненные
+    id для уникальности, поэтому выборка не использует OFFSET и не
+    замедляется на дальних страницах. Общее количество объектов
+    считается только по запросу (?count=true) и кэшируется.
+    """
+
+    page_size = PAGE_SIZE
+    page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request)
+        self.count = self.get_count(queryset, request)
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронная версия paginate_queryset."""
+        page_queryset = self.get_page_queryset(queryset, request)
+        self.count = await self.aget_count(queryset, request)
+        return self.set_page([instance async for instance in page_queryset])
+
+    def get_page_queryset(self, queryset, request):
+        """Запрос страницы с одним лишним объектом для проверки
+        наличия следующей страницы.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.position, self.reverse = self.decode_cursor(request, queryset)
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self.reverse_field(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(
+                ordering, self.position
+            ))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def get_ordering(self, queryset):
+        ordering = list(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        if not all(
+            isinstance(field, str) and field.lstrip('-') not in ('', '?')
+            for field in ordering
+        ):
+            raise ImproperlyConfigured(
+                'Пагинация по ключу поддерживает только сортировку '
+                'по полям и аннотациям, заданным строками'
+            )
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return ordering
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def get_keyset_filter(ordering, position):
+        """Условие выборки объектов, следующих за позицией
+        в заданной сортировке.
+        """
+        conditions = []
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            conditions.append(Q(
+                **{
+                    previous.lstrip('-'): value
+                    for previous, value in zip(ordering[:i], position)
+                },
+                **{f'{name}__{lookup}': position[i]}
+            ))
+        return reduce(or_, conditions)
+
+    def get_count_key(self, queryset, request):
+        if request.query_params.get(self.count_query_param) != 'true':
+            return None
+        return 'count:' + md5(str(queryset.query).encode()).hexdigest()
+
+    def get_count(self, queryset, request):
+        key = self.get_count_key(queryset, request)
+        if key is None:
+            return None
+        return cache.get_or_set(
+            key, queryset.count, timeout=CURSOR_COUNT_CACHE_TIMEOUT
+        )
+
+    async def aget_count(self, queryset, request):
+        key = self.get_count_key(queryset, request)
+        if key is None:
+            return None
+        count = await cache.aget(key)
+        if count is None:
+            count = await queryset.acount()
+            await cache.aset(key, count, timeout=CURSOR_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def decode_cursor(self, request, queryset):
+        """Позиция и направление из курсора.
+
+        Значения позиции приводятся к типам полей сортировки,
+        поэтому измененный курсор дает 404, а не ошибку запроса.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        query = queryset.query.chain()
+        try:
+            position, reverse = json.loads(
+                urlsafe_b64decode(encoded.encode('ascii'))
+            )
+            if (
+                not isinstance(position, list)
+                or not isinstance(reverse, bool)
+                or len(position) != len(self.ordering)
+            ):
+                raise ValueError
+            position = [
+                query.resolve_ref(field.lstrip('-')).output_field.to_python(
+                    value
+                )
+                for field, value in zip(self.ordering, position)
+            ]
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, instance, reverse):
+        position = [
+            getattr(instance, field.lstrip('-')) for field in self.ordering
+        ]
+        encoded = urlsafe_b64encode(json.dumps(
+            (position, reverse), default=str
+        ).encode()).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        }
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
 
 
 class PageNumberLimitPagination(PageNumberPagination):
-    """Класс пагинации."""
+    """Класс пагинации.
+
+    При наличии параметра cursor используется пагинация по ключу.
+    """
 
     page_size = PAGE_SIZE
     page_size_query_param = 'limit'
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if CursorLimitPagination.cursor_query_param in request.query_params:
+            self.cursor_paginator = CursorLimitPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронная версия paginate_queryset."""
+        if CursorLimitPagination.cursor_query_param in request.query_params:
+            self.cursor_paginator = CursorLimitPagination()
+            return await self.cursor_paginator.apaginate_queryset(
+                queryset, request, view
+            )
+        paginator = self.django_paginator_class(
+            queryset, self.get_page_size(request)
+        )
+        # Количество объектов считается заранее, поэтому paginator.page
+        # не выполняет запросов до чтения объектов страницы.
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)
+            ))
+        self.page.object_list = [
+            instance async for instance in self.page.object_list
+        ]
+        self.request = request
+        return self.page.object_list
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -1,6 +1,11 @@
 import base64
+import binascii
+from hashlib import md5
 
+from django.core.cache import cache
 from django.core.files.base import ContentFile
+from django.db import models, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from djoser.serializers import (
@@ -8,13 +13,23 @@ from djoser.serializers import (
     UserSerializer as DjoserUserSerializer
 )
 
+from core.constants import (
+    MAX_IMAGE_UPLOAD_SIZE, RECIPE_CACHE_TIMEOUT, BULK_IDS_MAX_LENGTH
+)
 from recipes.models import (
     User, Recipe, Ingredient, Tag, Subscription,
     IngredientRecipe, FavoriteRecipe, ShoppingCart
 )
+from recipes.search import refresh_search_index
+from recipes.utils import (
+    SHOPPING_CART_RECOMPUTATION, refresh_shopping_cart_ingredients,
+    get_recipe_cart_user_ids, get_tags_mask, get_model_version,
+    get_object_versions, bump_object_version, recomputed_explicitly
+)
+from .images import schedule_avatar_processing, schedule_image_processing
 from .validators import (
     is_not_selected_validator, only_one_selected_validator,
-    min_max_value_validator, is_not_exists_objects_validator
+    min_max_value_validator, missing_objects_validator
 )
 from .utils import (
     get_subscription_objects, get_favorite_recipe_objects,
@@ -25,11 +40,28 @@ from .utils import (
 class Base64ImageField(serializers.ImageField):
     """Класс поля для изображения."""
 
+    default_error_messages = {
+        'max_size': (
+            f'Размер изображения не должен превышать '
+            f'{MAX_IMAGE_UPLOAD_SIZE // (1024 * 1024)} МБ.'
+        ),
+        'invalid_base64': 'Некорректное изображение в формате base64.',
+    }
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
+            try:
+                format, imgstr = data.split(';base64,')
+            except ValueError:
+                self.fail('invalid_base64')
+            if len(imgstr) * 3 // 4 > MAX_IMAGE_UPLOAD_SIZE:
+                self.fail('max_size')
+            try:
+                decoded = base64.b64decode(imgstr, validate=True)
+            except binascii.Error:
+                self.fail('invalid_base64')
             ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = ContentFile(decoded, name='temp.' + ext)
         return super().to_internal_value(data)
 
 
@@ -38,7 +70,9 @@ class UserCreateSerializer(DjoserUserCreateSerializer):
 
     class Meta:
         model = User
-        fields = ('email', 'username', 'first_name', 'last_name', 'password')
+        fields = (
+            'email', 'id', 'username', 'first_name', 'last_name', 'password'
+        )
 
 
 class UserSerializer(DjoserUserSerializer):
@@ -54,6 +88,8 @@ class UserSerializer(DjoserUserSerializer):
         )
 
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         user = self.context.get('request').user
         return (
             user and user.is_authenticated
@@ -72,8 +108,10 @@ class RecipeShortSerializer(serializers.ModelSerializer):
 class SubscriptionSerializer(UserSerializer):
     """Сериализатор подписок."""
 
-    recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes = RecipeShortSerializer(
+        source='limited_recipes', many=True, read_only=True
+    )
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -82,28 +120,6 @@ class SubscriptionSerializer(UserSerializer):
             'is_subscribed', 'recipes', 'recipes_count', 'avatar'
         )
 
-    def get_recipes(self, author):
-        request = self.context.get('request')
-        recipes = author.recipes.all()
-        limit = request.query_params.get('recipes_limit')
-        if limit:
-            if limit.isdigit():
-                recipes = recipes[:int(limit)]
-            else:
-                raise serializers.ValidationError(
-                    {
-                        'detail':
-                        'Значение recipes_limit должно быть целочисленным'
-                    }
-                )
-        return RecipeShortSerializer(
-            recipes, many=True,
-            context={'request': self.context.get('request')}
-        ).data
-
-    def get_recipes_count(self, author):
-        return author.recipes.count()
-
 
 class CreateSubscriptionSerializer(serializers.ModelSerializer):
     """Сериализатор создания подписки."""
@@ -133,6 +149,11 @@ class UserAvatarSerializer(serializers.ModelSerializer):
         model = User
         fields = ('avatar',)
 
+    def update(self, user, validated_data):
+        user = super().update(user, validated_data)
+        schedule_avatar_processing(user, 'avatar')
+        return user
+
 
 class TagSerializer(serializers.ModelSerializer):
     """Сериализатор тегов."""
@@ -153,19 +174,14 @@ class IngredientSerializer(serializers.ModelSerializer):
 class IngredientRecipeWriteSerializer(serializers.ModelSerializer):
     """Сериализатор создания/изменения связи ингредиентов с рецептом."""
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    # Существование ингредиентов проверяется одним запросом
+    # в RecipeWriteSerializer.validate_ingredients.
+    id = serializers.IntegerField()
 
     class Meta:
         model = IngredientRecipe
         fields = ('id', 'amount')
 
-    def validate_id(self, ingredient):
-        is_not_exists_objects_validator(
-            Ingredient.objects.filter(id=ingredient.id),
-            'Такой ингредиент не существует'
-        )
-        return ingredient
-
     def validate_amount(self, amount):
         min_max_value_validator(amount, 'Количество')
         return amount
@@ -184,25 +200,83 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             'name', 'text', 'cooking_time'
         )
 
+    @staticmethod
+    def set_ingredients(recipe, ingredients, created=False):
+        """Сохранение ингредиентов рецепта по разнице с текущими.
+
+        Вставляются только новые ингредиенты, обновляются только
+        изменившиеся количества, удаляются только убранные.
+        Возвращает id затронутых ингредиентов.
+        """
+        amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        current = {} if created else {
+            ingredient_recipe.ingredient_id: ingredient_recipe
+            for ingredient_recipe in recipe.recipe_ingredients.all()
+        }
+        removed = current.keys() - amounts.keys()
+        added = amounts.keys() - current.keys()
+        changed = [
+            ingredient_recipe
+            for ingredient_id, ingredient_recipe in current.items()
+            if ingredient_id in amounts
+            and ingredient_recipe.amount != amounts[ingredient_id]
+        ]
+        if removed:
+            removed_links = recipe.recipe_ingredients.filter(
+                ingredient_id__in=removed
+            )
+            # Корзины пересчитываются в create_update_recipe вместе
+            # с добавленными и измененными ингредиентами.
+            with recomputed_explicitly(SHOPPING_CART_RECOMPUTATION):
+                removed_links.delete()
+        if changed:
+            for ingredient_recipe in changed:
+                ingredient_recipe.amount = amounts[
+                    ingredient_recipe.ingredient_id
+                ]
+            IngredientRecipe.objects.bulk_update(changed, ('amount',))
+        if added:
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(
+                    recipe=recipe, ingredient_id=ingredient_id,
+                    amount=amounts[ingredient_id]
+                )
+                for ingredient_id in added
+            )
+        return removed | added | {
+            ingredient_recipe.ingredient_id for ingredient_recipe in changed
+        }
+
+    @transaction.atomic
     def create_update_recipe(self, validated_data, instance=None):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
+        # Маска сохраняется вместе с рецептом, и сигнал m2m_changed
+        # при установке тегов не выполняет лишних запросов.
+        validated_data['tags_mask'] = get_tags_mask(tag.id for tag in tags)
         if instance:
+            # Ингредиенты меняются до сохранения рецепта, и сигнал
+            # post_save обновляет поисковый индекс уже с ними.
+            affected = self.set_ingredients(instance, ingredients)
             recipe = super().update(instance, validated_data)
-            instance.ingredients.clear()
         else:
             recipe = super().create(validated_data)
-        ingredient_list = []
-        for ingredient in ingredients:
-            ingredient_list.append(
-                IngredientRecipe(
-                    recipe=recipe,
-                    ingredient=ingredient.get('id'),
-                    amount=ingredient.get('amount')
-                )
-            )
-        IngredientRecipe.objects.bulk_create(ingredient_list)
+            self.set_ingredients(recipe, ingredients, created=True)
+            refresh_search_index(Recipe.objects.filter(pk=recipe.pk))
+        # set() меняет только отличающиеся связи.
         recipe.tags.set(tags)
+        if 'image' in validated_data:
+            schedule_image_processing(recipe, 'image', 'image_variants')
+        if instance and affected:
+            refresh_shopping_cart_ingredients(
+                get_recipe_cart_user_ids(recipe), affected
+            )
+        # Ингредиенты меняются через bulk_create и bulk_update
+        # без сигналов.
+        bump_object_version(Recipe, recipe.pk)
         return recipe
 
     def create(self, validated_data):
@@ -221,7 +295,13 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         is_not_selected_validator(ingredients, name)
         ingredients_id_list = [item.get('id') for item in ingredients]
         only_one_selected_validator(ingredients_id_list, name)
-        return ingredients
+        found = Ingredient.objects.in_bulk(ingredients_id_list)
+        missing_objects_validator(
+            ingredients_id_list, found, 'Не существуют ингредиенты'
+        )
+        return [
+            {**item, 'id': found[item['id']]} for item in ingredients
+        ]
 
     def validate_tags(self, tags):
         name = 'тег'
@@ -233,6 +313,16 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         min_max_value_validator(time, 'Время приготовления')
         return time
 
+    def validate(self, data):
+        # Ингредиенты и теги обязательны и при частичном обновлении.
+        missing = {
+            name: self.fields[name].error_messages['required']
+            for name in ('ingredients', 'tags') if name not in data
+        }
+        if missing:
+            raise serializers.ValidationError(missing)
+        return data
+
 
 class IngredientRecipeReadSerializer(serializers.ModelSerializer):
     """Сериализатор чтения связи ингредиентов с рецептом."""
@@ -248,14 +338,63 @@ class IngredientRecipeReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
-    """Сериализатор чтения рецептов."""
+def merge_fields(fields, body, overlay):
+    """Представление из общей части и полей пользователя
+    в порядке fields.
+    """
+    return {
+        field: overlay[field] if field in overlay else body[field]
+        for field in fields
+    }
+
+
+class AuthorSerializer(UserSerializer):
+    """Сериализатор автора без полей, зависящих от пользователя."""
+
+    class Meta(UserSerializer.Meta):
+        fields = tuple(
+            field for field in UserSerializer.Meta.fields
+            if field != 'is_subscribed'
+        )
+
+
+class RecipeBodySerializer(serializers.ModelSerializer):
+    """Сериализатор общей для всех пользователей части рецепта."""
 
     tags = TagSerializer(many=True, read_only=True)
-    author = UserSerializer(read_only=True)
+    author = AuthorSerializer(read_only=True)
     ingredients = IngredientRecipeReadSerializer(
         source='recipe_ingredients', many=True, read_only=True
     )
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'id', 'tags', 'author', 'ingredients',
+            'name', 'image', 'text', 'cooking_time'
+        )
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Сериализатор списка рецептов: общие части всех рецептов
+    страницы читаются из кэша одним запросом.
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, models.manager.BaseManager):
+            data = data.all()
+        return self.child.represent(list(data))
+
+
+class RecipeReadSerializer(serializers.ModelSerializer):
+    """Сериализатор чтения рецептов.
+
+    Общая часть рецепта (RecipeBodySerializer) кэшируется по id
+    и версиям рецепта, автора, тегов и ингредиентов. Поля,
+    зависящие от пользователя, берутся из аннотаций queryset
+    (annotate_recipes) и добавляются к копии общей части.
+    """
+
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -266,11 +405,14 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'is_favorited', 'is_in_shopping_cart',
             'name', 'image', 'text', 'cooking_time'
         )
+        list_serializer_class = RecipeListSerializer
 
     def get_user(self):
         return self.context.get('request').user
 
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         user = self.get_user()
         return (
             user and user.is_authenticated
@@ -278,12 +420,86 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         user = self.get_user()
         return (
             user and user.is_authenticated
             and get_shopping_cart_objects(user, recipe).exists()
         )
 
+    def get_is_subscribed(self, recipe):
+        if hasattr(recipe, 'is_subscribed'):
+            return recipe.is_subscribed
+        user = self.get_user()
+        return (
+            user and user.is_authenticated
+            and user.subscribers.filter(author=recipe.author_id).exists()
+        )
+
+    def to_representation(self, recipe):
+        return self.represent([recipe])[0]
+
+    def represent(self, recipes):
+        bodies = self.get_bodies(recipes)
+        return [
+            merge_fields(self.Meta.fields, bodies[recipe.pk], {
+                'author': merge_fields(
+                    UserSerializer.Meta.fields, bodies[recipe.pk]['author'],
+                    {'is_subscribed': self.get_is_subscribed(recipe)}
+                ),
+                'is_favorited': self.get_is_favorited(recipe),
+                'is_in_shopping_cart': self.get_is_in_shopping_cart(recipe),
+            }) for recipe in recipes
+        ]
+
+    def get_body_keys(self, recipes):
+        request = self.context.get('request')
+        shared = (
+            f'{get_model_version(Tag)}:{get_model_version(Ingredient)}:'
+            f'{request.build_absolute_uri("/") if request else ""}'
+        )
+        versions = get_object_versions(
+            pair for recipe in recipes for pair in (
+                (Recipe, recipe.pk), (User, recipe.author_id)
+            )
+        )
+        return {
+            recipe.pk: 'recipe:{}:{}'.format(recipe.pk, md5(
+                f'{versions[Recipe, recipe.pk]}:'
+                f'{versions[User, recipe.author_id]}:{shared}'.encode()
+            ).hexdigest()) for recipe in recipes
+        }
+
+    def get_bodies(self, recipes):
+        """Общие части рецептов из кэша. Отсутствующие в кэше
+        сериализуются с подгрузкой связанных объектов.
+        """
+        keys = self.get_body_keys(recipes)
+        cached = cache.get_many(keys.values())
+        missing = [
+            recipe for recipe in recipes if keys[recipe.pk] not in cached
+        ]
+        if missing:
+            prefetch_related_objects(
+                missing, 'author', 'tags', Prefetch(
+                    'recipe_ingredients',
+                    queryset=IngredientRecipe.objects.select_related(
+                        'ingredient'
+                    )
+                )
+            )
+            created = {
+                keys[recipe.pk]: body for recipe, body in zip(
+                    missing, RecipeBodySerializer(
+                        missing, many=True, context=self.context
+                    ).data
+                )
+            }
+            cache.set_many(created, timeout=RECIPE_CACHE_TIMEOUT)
+            cached.update(created)
+        return {recipe.pk: cached[keys[recipe.pk]] for recipe in recipes}
+
 
 class CreteFavoriteRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор создания избранного рецепта."""
@@ -311,3 +527,12 @@ class CreateShoppingCartSerializer(serializers.ModelSerializer):
                 message='Данный рецепт уже находится у вас в корзине'
             ),
         )
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Сериализатор списка id для массового добавления и удаления."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False,
+        max_length=BULK_IDS_MAX_LENGTH
+    )
@@ -0,0 +1,112 @@
+"""Короткие ссылки на рецепты."""
+from threading import Lock
+
+from core.constants import (
+    SHORT_LINK_ALPHABET, SHORT_LINK_CODE_LENGTH, SHORT_LINK_BITS,
+    SHORT_LINK_MULTIPLIERS, SHORT_LINK_OFFSET
+)
+from recipes.models import Recipe
+from recipes.utils import get_model_version
+
+SHORT_LINK_MODULUS = 2 ** SHORT_LINK_BITS
+SHORT_LINK_SHIFT = SHORT_LINK_BITS // 2
+SHORT_LINK_INVERSES = tuple(
+    pow(multiplier, -1, SHORT_LINK_MODULUS)
+    for multiplier in SHORT_LINK_MULTIPLIERS
+)
+SHORT_LINK_BASE = len(SHORT_LINK_ALPHABET)
+SHORT_LINK_LETTERS = SHORT_LINK_ALPHABET.lstrip('0123456789')
+
+
+def has_letter(number):
+    """Есть ли буква в записи числа алфавитом коротких ссылок."""
+    for _ in range(SHORT_LINK_CODE_LENGTH):
+        number, digit = divmod(number, SHORT_LINK_BASE)
+        if SHORT_LINK_ALPHABET[digit] in SHORT_LINK_LETTERS:
+            return True
+    return False
+
+
+def encode_short_code(pk):
+    """Кодирование id рецепта в короткий непрозрачный код.
+
+    Id переставляется обратимым перемешиванием по модулю
+    2^SHORT_LINK_BITS и записывается в base62. Код без букв сдвигается
+    в неиспользуемый диапазон выше 2^SHORT_LINK_BITS, чтобы не совпасть
+    со старой ссылкой по числовому id.
+    """
+    first, second = SHORT_LINK_MULTIPLIERS
+    number = (pk * first + SHORT_LINK_OFFSET) % SHORT_LINK_MODULUS
+    number ^= number >> SHORT_LINK_SHIFT
+    number = number * second % SHORT_LINK_MODULUS
+    if not has_letter(number):
+        number += SHORT_LINK_MODULUS
+    code = []
+    for _ in range(SHORT_LINK_CODE_LENGTH):
+        number, digit = divmod(number, SHORT_LINK_BASE)
+        code.append(SHORT_LINK_ALPHABET[digit])
+    return ''.join(reversed(code))
+
+
+def decode_short_code(code):
+    """Получение id рецепта из короткого кода или None."""
+    number = 0
+    for char in code:
+        digit = SHORT_LINK_ALPHABET.find(char)
+        if digit == -1:
+            return None
+        number = number * SHORT_LINK_BASE + digit
+    if number >= SHORT_LINK_MODULUS:
+        number -= SHORT_LINK_MODULUS
+        if number >= SHORT_LINK_MODULUS or has_letter(number):
+            return None
+    elif not has_letter(number):
+        return None
+    first, second = SHORT_LINK_INVERSES
+    number = number * second % SHORT_LINK_MODULUS
+    number ^= number >> SHORT_LINK_SHIFT
+    return (number - SHORT_LINK_OFFSET) * first % SHORT_LINK_MODULUS
+
+
+class RecipeIdSet:
+    """Битовая карта id существующих рецептов в памяти процесса.
+
+    Перестраивается при изменении версии данных модели Recipe,
+    которая меняется только при создании и удалении рецептов,
+    поэтому проверка существования рецепта не обращается к БД.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.bitmap = bytearray()
+        self.lock = Lock()
+
+    def refresh(self):
+        version = get_model_version(Recipe)
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            bitmap = bytearray()
+            for pk in Recipe.objects.order_by('-pk').values_list(
+                'pk', flat=True
+            ).iterator():
+                index = pk >> 3
+                if index >= len(bitmap):
+                    bitmap.extend(bytes(index - len(bitmap) + 1))
+                bitmap[index] |= 1 << (pk & 7)
+            self.bitmap = bitmap
+            self.version = version
+
+    def __contains__(self, pk):
+        self.refresh()
+        bitmap = self.bitmap
+        index = pk >> 3
+        return (
+            0 <= index < len(bitmap)
+            and bool(bitmap[index] & 1 << (pk & 7))
+        )
+
+
+recipe_ids = RecipeIdSet()
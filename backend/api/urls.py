@@ -3,7 +3,7 @@ from rest_framework import routers
 
 from .views import (
     UserViewSet, RecipeViewSet,
-    IngredientViewSet, TagViewSet
+    IngredientViewSet, TagViewSet, TokenCacheStatsView
 )
 
 router_v1 = routers.DefaultRouter()
@@ -15,5 +15,9 @@ router_v1.register('tags', TagViewSet)
 
 urlpatterns = [
     path('', include(router_v1.urls)),
+    path(
+        'auth/token/cache-stats/', TokenCacheStatsView.as_view(),
+        name='token-cache-stats'
+    ),
     path('auth/', include('djoser.urls.authtoken'))
 ]
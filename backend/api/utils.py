@@ -1,39 +1,72 @@
-from django.db.models import Sum
-from django.shortcuts import redirect
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Prefetch, Value
+from django.http import (
+    Http404, HttpResponse, HttpResponseForbidden,
+    HttpResponsePermanentRedirect
+)
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
 from django.views.decorators.http import require_GET
 
-from recipes.models import Recipe, IngredientRecipe
-from .validators import is_not_exists_objects_validator
+from core.constants import (
+    ADD_LINKS_ATTEMPTS, METRICS_LOCAL_ADDRESSES, SHORT_LINK_CACHE_MAX_AGE
+)
+from recipes.models import (
+    User, Recipe, Subscription, FavoriteRecipe, ShoppingCart
+)
+from recipes.utils import change_links_counters, delete_links
+from . import metrics
+from .short_links import decode_short_code, recipe_ids
 
 
 @require_GET
-def get_short_url(request, pk):
-    """Получение короткой ссылки на рецепт."""
-    recipes = Recipe.objects.filter(pk=pk)
-    is_not_exists_objects_validator(recipes, 'Рецепт не найден')
-    return redirect(f'/recipes/{pk}/')
+def get_short_url(request, code=None, pk=None):
+    """Переход по короткой ссылке на рецепт."""
+    return get_short_url_redirect(code, pk)
 
 
-def get_ingredients_in_shopping_cart(user):
-    """Получение ингредиентов корзины покупок."""
-    return (
-        IngredientRecipe.objects.filter(
-            recipe__recipes_in_cart__user=user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            total_amount=Sum('amount')
+def get_short_url_redirect(code=None, pk=None):
+    """Ответ с переходом на рецепт по короткому коду или id."""
+    if code is not None:
+        pk = decode_short_code(code)
+    if pk is None or pk not in recipe_ids:
+        raise Http404('Рецепт не найден')
+    response = HttpResponsePermanentRedirect(f'/recipes/{pk}/')
+    patch_cache_control(
+        response, public=True, max_age=SHORT_LINK_CACHE_MAX_AGE
+    )
+    return response
+
+
+@require_GET
+def get_metrics(request):
+    """Метрики запросов в текстовом формате Prometheus.
+
+    Доступны по токену METRICS_TOKEN, а если он не задан - только
+    с локального адреса.
+    """
+    if settings.METRICS_TOKEN:
+        allowed = constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}'
         )
+    else:
+        allowed = request.META.get('REMOTE_ADDR') in METRICS_LOCAL_ADDRESSES
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4'
     )
 
 
-def get_list_of_ingredients_string(ingredients):
-    """Формирование списка ингредиентов."""
-    return '\n'.join(
-        f'{i+1}.{ingredient.get("ingredient__name").capitalize()} - '
-        f'{ingredient.get("total_amount")} '
-        f'({ingredient.get("ingredient__measurement_unit")})'
-        for i, ingredient in enumerate(ingredients)
+def get_ingredients_in_shopping_cart(user):
+    """Получение ингредиентов корзины покупок."""
+    return (
+        user.cart_ingredients.values(
+            'ingredient__name', 'ingredient__measurement_unit',
+            'total_amount'
+        ).order_by('ingredient__name')
     )
 
 
@@ -50,3 +83,124 @@ def get_favorite_recipe_objects(user, recipe):
 def get_shopping_cart_objects(user, recipe):
     """Получение рецептов, находящихся в корзине покупок."""
     return user.recipes_in_cart.filter(recipe=recipe)
+
+
+def get_linked_objects(queryset, link_model, user, field, ids):
+    """Объекты queryset с id из ids и признак их связи
+    с пользователем: словарь {id: есть ли связь}.
+    """
+    return dict(queryset.filter(pk__in=ids).annotate(
+        is_linked=Exists(link_model.objects.filter(
+            user=user, **{field: OuterRef('pk')}
+        ))
+    ).values_list('pk', 'is_linked'))
+
+
+def add_links(queryset, link_model, user, field, ids, forbidden=()):
+    """Добавление связей пользователя (избранное, корзина, подписки)
+    с объектами queryset по списку id.
+
+    Существование объектов и уже добавленные связи проверяются
+    одним запросом, новые связи вставляются одним bulk_create.
+    Если параллельный запрос успел добавить одну из связей, вставка
+    нарушает уникальность: транзакция откатывается, и проверка
+    повторяется. Поэтому счетчики увеличиваются ровно на число
+    вставленных связей.
+    Возвращает статус каждого id и список id добавленных связей.
+    """
+    for attempt in range(ADD_LINKS_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return insert_links(
+                    queryset, link_model, user, field, ids, forbidden
+                )
+        except IntegrityError:
+            if attempt == ADD_LINKS_ATTEMPTS - 1:
+                raise
+
+
+def insert_links(queryset, link_model, user, field, ids, forbidden):
+    """Проверка и вставка связей для add_links."""
+    linked = get_linked_objects(queryset, link_model, user, field, ids)
+    statuses = {}
+    for pk in ids:
+        if pk not in linked:
+            statuses[pk] = 'not_found'
+        elif pk in forbidden:
+            statuses[pk] = 'forbidden'
+        else:
+            statuses[pk] = 'exists' if linked[pk] else 'created'
+    created = [pk for pk, status in statuses.items() if status == 'created']
+    link_model.objects.bulk_create(
+        link_model(user=user, **{f'{field}_id': pk}) for pk in created
+    )
+    change_links_counters(link_model, created, 1)
+    return statuses, created
+
+
+def remove_links(queryset, link_model, user, field, ids):
+    """Удаление связей пользователя с объектами queryset по списку id.
+
+    Возвращает статус каждого id и список id удаленных связей.
+    """
+    linked = get_linked_objects(queryset, link_model, user, field, ids)
+    statuses = {
+        pk: 'not_found' if pk not in linked
+        else 'deleted' if linked[pk] else 'absent'
+        for pk in ids
+    }
+    deleted = [pk for pk, status in statuses.items() if status == 'deleted']
+    if deleted:
+        delete_links(link_model.objects.filter(user=user), field, deleted)
+    return statuses, deleted
+
+
+def annotate_users(queryset, user):
+    """Аннотирование пользователей признаком подписки текущего пользователя."""
+    if not user.is_authenticated:
+        return queryset.annotate(is_subscribed=Value(False))
+    return queryset.annotate(
+        is_subscribed=Exists(
+            Subscription.objects.filter(user=user, author=OuterRef('pk'))
+        )
+    )
+
+
+def annotate_recipes(queryset, user):
+    """Аннотирование рецептов признаками избранного, корзины
+    и подписки на автора для текущего пользователя.
+
+    Связанные объекты не подгружаются: общая часть рецепта
+    берется из кэша RecipeReadSerializer.
+    """
+    if not user.is_authenticated:
+        return queryset.annotate(
+            is_favorited=Value(False), is_in_shopping_cart=Value(False),
+            is_subscribed=Value(False)
+        )
+    return queryset.annotate(
+        is_favorited=Exists(
+            FavoriteRecipe.objects.filter(user=user, recipe=OuterRef('pk'))
+        ),
+        is_in_shopping_cart=Exists(
+            ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+        ),
+        is_subscribed=Exists(
+            Subscription.objects.filter(user=user, author=OuterRef('author'))
+        )
+    )
+
+
+def get_subscribed_authors(user, recipes_limit=None):
+    """Получение авторов, на которых подписан пользователь,
+    в порядке подписки с ограниченным списком рецептов.
+    Количество рецептов хранится в поле recipes_count.
+    """
+    recipes = Recipe.objects.all()
+    if recipes_limit is not None:
+        recipes = recipes[:recipes_limit]
+    return User.objects.filter(subscribing__user=user).annotate(
+        is_subscribed=Value(True)
+    ).order_by('subscribing__id').prefetch_related(
+        Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+    )
@@ -9,6 +9,30 @@ def is_not_exists_objects_validator(obj, message):
         raise ValidationError({'detail': message})
 
 
+def missing_objects_validator(ids, found, message):
+    """Валидатор проверки, что все объекты из ids найдены.
+
+    Отсутствующие id перечисляются в одной ошибке.
+    """
+    missing = [str(pk) for pk in ids if pk not in found]
+    if missing:
+        raise ValidationError(f'{message}: {", ".join(missing)}')
+
+
+def is_not_digit_validator(value, message):
+    """Валидатор проверки, что значение не является целым числом."""
+    if value is not None and not value.isdigit():
+        raise ValidationError({'detail': message})
+
+
+def is_not_supported_format_validator(export_format, formats):
+    """Валидатор проверки, что формат файла не поддерживается."""
+    if export_format not in formats:
+        raise ValidationError(
+            {'detail': f'Поддерживаемые форматы: {", ".join(formats)}'}
+        )
+
+
 def number_deleted_objects_validator(number_deleted_objects, message):
     """Валидатор проверки, количества удаленных объектов."""
     if number_deleted_objects == 0:
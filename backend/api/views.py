@@ -1,15 +1,22 @@
-from django.http import FileResponse
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework.reverse import reverse
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from rest_framework.status import HTTP_201_CREATED, HTTP_204_NO_CONTENT
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 
-from recipes.models import User, Recipe, Ingredient, Tag
+from core.constants import SHOPPING_LIST_FILENAME
+from recipes.models import (
+    User, Recipe, Ingredient, Tag, Subscription, FavoriteRecipe, ShoppingCart
+)
+from recipes.utils import (
+    refresh_shopping_cart_ingredients, get_recipes_ingredient_ids
+)
 from .serializers import (
     UserAvatarSerializer, RecipeWriteSerializer, RecipeReadSerializer,
     IngredientSerializer, TagSerializer, SubscriptionSerializer,
@@ -17,27 +24,48 @@ from .serializers import (
     CreteFavoriteRecipeSerializer, CreateShoppingCartSerializer
 )
 from .utils import (
-    get_ingredients_in_shopping_cart, get_list_of_ingredients_string,
-    get_subscription_objects, get_favorite_recipe_objects,
-    get_shopping_cart_objects
+    get_ingredients_in_shopping_cart, get_subscription_objects,
+    get_favorite_recipe_objects, get_shopping_cart_objects,
+    annotate_users, annotate_recipes, get_subscribed_authors,
+    add_links, remove_links
 )
+from .authentication import token_cache
+from .exporters import SHOPPING_LIST_EXPORTERS
 from .pagination import PageNumberLimitPagination
-from .filters import RecipeFilter, IngredientFilter
+from .filters import RecipeFilter
+from .indexes import ingredient_index
+from .mixins import VersionedCacheMixin, BulkLinksMixin
+from .short_links import encode_short_code, recipe_ids
 from .validators import (
-    is_not_exists_objects_validator, number_deleted_objects_validator
+    is_not_exists_objects_validator, number_deleted_objects_validator,
+    is_not_digit_validator, is_not_supported_format_validator
 )
 from .permissions import IsAuthenticatedOrIsAuthorOrReadOnly
 
 
-class UserViewSet(DjoserUserViewSet):
+class UserViewSet(BulkLinksMixin, DjoserUserViewSet):
     """Расширение передставления пользователя:
     добавление/удаление аватара;
-    добавление/удаление подписки;
+    добавление/удаление подписки, в том числе на несколько авторов;
     список подписок.
     """
 
     pagination_class = PageNumberLimitPagination
 
+    def get_queryset(self):
+        return annotate_users(super().get_queryset(), self.request.user)
+
+    def get_subscribed_authors(self):
+        # Пустое значение, как и отсутствие параметра, не ограничивает
+        # рецепты, а 0 оставляет список рецептов пустым.
+        recipes_limit = self.request.query_params.get('recipes_limit') or None
+        is_not_digit_validator(
+            recipes_limit, 'Значение recipes_limit должно быть целочисленным'
+        )
+        return get_subscribed_authors(
+            self.request.user, recipes_limit and int(recipes_limit)
+        )
+
     @action(methods=('put',), detail=False, url_path='me/avatar')
     def avatar(self, request):
         """Добавление аватара."""
@@ -58,13 +86,17 @@ class UserViewSet(DjoserUserViewSet):
     def subscribe(self, request, id=None):
         """Добавление подписки."""
         author = get_object_or_404(User, id=id)
+        subscribed_authors = self.get_subscribed_authors()
         serializer = CreateSubscriptionSerializer(
             data={'user': request.user.id, 'author': author.id}
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(
-            SubscriptionSerializer(author, context={'request': request}).data,
+            SubscriptionSerializer(
+                subscribed_authors.get(id=author.id),
+                context={'request': request}
+            ).data,
             status=HTTP_201_CREATED
         )
 
@@ -80,28 +112,56 @@ class UserViewSet(DjoserUserViewSet):
         )
         return Response(status=HTTP_204_NO_CONTENT)
 
+    @action(methods=('post',), detail=False, url_path='subscribe')
+    def bulk_subscribe(self, request):
+        """Добавление подписок на несколько авторов."""
+        statuses, _ = add_links(
+            User.objects.all(), Subscription, request.user, 'author',
+            self.get_bulk_ids(), forbidden=(request.user.id,)
+        )
+        return self.get_bulk_response(statuses)
+
+    @bulk_subscribe.mapping.delete
+    def bulk_delete_subscribe(self, request):
+        """Удаление подписок на несколько авторов."""
+        statuses, _ = remove_links(
+            User.objects.all(), Subscription, request.user, 'author',
+            self.get_bulk_ids()
+        )
+        return self.get_bulk_response(statuses)
+
     @action(
         methods=('get',), detail=False, permission_classes=(IsAuthenticated,)
     )
     def subscriptions(self, request):
         """Список подписок."""
-        queryset = [obj.author for obj in request.user.subscribers.all()]
-        pages = self.paginate_queryset(queryset)
+        pages = self.paginate_queryset(self.get_subscribed_authors())
         serializer = SubscriptionSerializer(
             pages, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(BulkLinksMixin, ModelViewSet):
     """Представление рецептов."""
 
     queryset = Recipe.objects.all()
+    lookup_value_regex = r'\d+'
     permission_classes = (IsAuthenticatedOrIsAuthorOrReadOnly,)
     pagination_class = PageNumberLimitPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        return annotate_recipes(Recipe.objects.all(), self.request.user)
+
+    def perform_content_negotiation(self, request, force=False):
+        # Параметр format списка покупок задает формат файла,
+        # а не рендерер DRF.
+        return super().perform_content_negotiation(
+            request, force=force or self.action == 'download_shopping_cart'
+        )
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeReadSerializer
@@ -116,8 +176,9 @@ class RecipeViewSet(ModelViewSet):
     )
     def get_link(self, request, pk=None):
         """Получение короткой ссылки."""
-        recipe = get_object_or_404(Recipe, pk=pk)
-        link = reverse('short_url', args=[recipe.pk])
+        if int(pk) not in recipe_ids:
+            raise Http404('Рецепт не найден')
+        link = reverse('short_url', args=[encode_short_code(int(pk))])
         return Response(
             {'short-link': request.build_absolute_uri(link)}
         )
@@ -149,6 +210,24 @@ class RecipeViewSet(ModelViewSet):
         )
         return Response(status=HTTP_204_NO_CONTENT)
 
+    @action(methods=('post',), detail=False, url_path='favorite')
+    def bulk_favorite(self, request):
+        """Добавление нескольких рецептов в избранное."""
+        statuses, _ = add_links(
+            Recipe.objects.all(), FavoriteRecipe, request.user, 'recipe',
+            self.get_bulk_ids()
+        )
+        return self.get_bulk_response(statuses)
+
+    @bulk_favorite.mapping.delete
+    def bulk_delete_from_favorite(self, request):
+        """Удаление нескольких рецептов из избранного."""
+        statuses, _ = remove_links(
+            Recipe.objects.all(), FavoriteRecipe, request.user, 'recipe',
+            self.get_bulk_ids()
+        )
+        return self.get_bulk_response(statuses)
+
     @action(methods=('post',), detail=True)
     def shopping_cart(self, request, pk=None):
         """Добавление в корзину."""
@@ -176,31 +255,77 @@ class RecipeViewSet(ModelViewSet):
         )
         return Response(status=HTTP_204_NO_CONTENT)
 
+    @action(methods=('post',), detail=False, url_path='shopping_cart')
+    def bulk_shopping_cart(self, request):
+        """Добавление нескольких рецептов в корзину."""
+        statuses, created = add_links(
+            Recipe.objects.all(), ShoppingCart, request.user, 'recipe',
+            self.get_bulk_ids()
+        )
+        # Связи вставляются через bulk_create без сигнала post_save,
+        # который пересчитывает корзину.
+        refresh_shopping_cart_ingredients(
+            (request.user.id,), get_recipes_ingredient_ids(created)
+        )
+        return self.get_bulk_response(statuses)
+
+    @bulk_shopping_cart.mapping.delete
+    def bulk_delete_from_shopping_cart(self, request):
+        """Удаление нескольких рецептов из корзины."""
+        statuses, _ = remove_links(
+            Recipe.objects.all(), ShoppingCart, request.user, 'recipe',
+            self.get_bulk_ids()
+        )
+        return self.get_bulk_response(statuses)
+
     @action(
         methods=('get',), detail=False, permission_classes=(IsAuthenticated,)
     )
     def download_shopping_cart(self, request):
         """Загрузка списка ингредиентов из корзины."""
+        export_format = request.query_params.get('format', 'txt')
+        is_not_supported_format_validator(
+            export_format, SHOPPING_LIST_EXPORTERS
+        )
         ingredients = get_ingredients_in_shopping_cart(request.user)
         is_not_exists_objects_validator(ingredients, 'В корзине ничего нет')
-        return FileResponse(
-            get_list_of_ingredients_string(ingredients),
-            filename='shopping_list',
-            content_type='text/plain; charset=UTF-8'
+        exporter = SHOPPING_LIST_EXPORTERS[export_format](ingredients)
+        return StreamingHttpResponse(
+            exporter,
+            content_type=exporter.content_type,
+            headers={
+                'Content-Disposition':
+                f'attachment; filename="{SHOPPING_LIST_FILENAME}.'
+                f'{export_format}"'
+            }
         )
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(VersionedCacheMixin, ReadOnlyModelViewSet):
     """Представление ингредиентов."""
 
+    cache_models = (Ingredient,)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (IngredientFilter,)
-    search_fields = ('^name', 'name')
 
+    def list(self, request, *args, **kwargs):
+        return Response(
+            ingredient_index.search(request.query_params.get('name'))
+        )
 
-class TagViewSet(ReadOnlyModelViewSet):
-    """Представление ингредиентов."""
 
+class TagViewSet(VersionedCacheMixin, ReadOnlyModelViewSet):
+    """Представление тегов."""
+
+    cache_models = (Tag,)
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+
+
+class TokenCacheStatsView(APIView):
+    """Статистика кэша токенов текущего процесса."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(token_cache.stats())
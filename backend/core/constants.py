@@ -7,3 +7,53 @@ MAX_VALUE = 32767
 PAGE_SIZE = 6
 INLINE_EXTRA_FIELDS = 0
 MIN_NUM = 1
+SHOPPING_LIST_FILENAME = 'shopping_list'
+SHOPPING_LIST_CHUNK_SIZE = 64 * 1024
+PDF_FONT_NAME = 'ShoppingListFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+INGREDIENT_SEARCH_LIMIT = 50
+CURSOR_COUNT_CACHE_TIMEOUT = 60
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+MAX_IMAGE_UPLOAD_SIZE = 10 * 1024 * 1024
+IMAGE_VARIANTS = {'webp': (1280, 1280), 'thumbnail': (320, 320)}
+IMAGE_VARIANT_QUALITY = 80
+AVATAR_MAX_SIZE = (512, 512)
+IMAGE_PROCESSING_WORKERS = 2
+SHORT_LINK_ALPHABET = (
+    '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+)
+SHORT_LINK_CODE_LENGTH = 7
+SHORT_LINK_BITS = 40
+SHORT_LINK_MULTIPLIERS = (0xB5AD4ECEDB, 0x9E3779B97)
+SHORT_LINK_OFFSET = 0x2545F4914F
+SHORT_LINK_CACHE_MAX_AGE = 60 * 60 * 24
+ADD_LINKS_ATTEMPTS = 3
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_TTL = 5 * 60
+METRICS_DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+METRICS_QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+METRICS_SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2)
+METRICS_FLUSH_INTERVAL = 5
+METRICS_LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+METRICS_WORKER_TIMEOUT = 60 * 60
+METRICS_QUERY_BUDGETS = {
+    'recipe-list': 6,
+    'recipe-detail': 6,
+    'recipe-download-shopping-cart': 3,
+    'user-subscriptions': 4,
+    'ingredient-list': 1,
+    'tag-list': 1,
+}
+TAGS_MASK_BITS = 63
+ADMIN_COUNT_ESTIMATE_THRESHOLD = 10000
+RECIPE_CACHE_TIMEOUT = 60 * 60 * 24
+SEARCH_CONFIG = 'russian'
+SEARCH_WEIGHTS = ('A', 'B', 'C')
+SQLITE_SEARCH_TABLE = 'recipes_recipe_search'
+SQLITE_SEARCH_WEIGHTS = (10.0, 5.0, 1.0)
+SEARCH_INDEX_BATCH_SIZE = 10000
+BULK_IDS_MAX_LENGTH = 100
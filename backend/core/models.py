@@ -13,3 +13,32 @@ class NameModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class CountersModel(models.Model):
+    """Абстрактная модель со счетчиками, которые меняются только
+    запросами UPDATE с F().
+
+    Полное сохранение существующего объекта записывает все поля,
+    кроме счетчиков, чтобы не перезаписать их устаревшими значениями
+    из памяти.
+    """
+
+    COUNTER_FIELDS = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not (
+            self._state.adding or args or kwargs.get('force_insert')
+            or kwargs.get('update_fields') is not None
+        ):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,39 @@
+"""Маршруты ASGI приложения.
+
+Чтение рецептов, тегов, ингредиентов и переход по коротким ссылкам
+обрабатываются асинхронными представлениями, остальные маршруты
+совпадают с маршрутами WSGI приложения (ROOT_URLCONF).
+"""
+from django.urls import path, re_path
+
+from api import async_views
+from .urls import SHORT_CODE_PATTERN, urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path(
+        'api/recipes/', async_views.RecipeListView.as_view(),
+        name='recipe-list'
+    ),
+    path(
+        'api/recipes/<int:pk>/', async_views.RecipeDetailView.as_view(),
+        name='recipe-detail'
+    ),
+    path('api/tags/', async_views.TagListView.as_view(), name='tag-list'),
+    path(
+        'api/tags/<int:pk>/', async_views.TagDetailView.as_view(),
+        name='tag-detail'
+    ),
+    path(
+        'api/ingredients/', async_views.IngredientListView.as_view(),
+        name='ingredient-list'
+    ),
+    path(
+        'api/ingredients/<int:pk>/',
+        async_views.IngredientDetailView.as_view(),
+        name='ingredient-detail'
+    ),
+    re_path(
+        SHORT_CODE_PATTERN, async_views.get_short_url, name='short_url'
+    ),
+    path('s/<int:pk>/', async_views.get_short_url, name='legacy_short_url'),
+] + sync_urlpatterns
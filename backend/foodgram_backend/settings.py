@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -30,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
+    'api.middleware.AsyncRoutesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,6 +43,8 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = 'foodgram_backend.urls'
+# Маршруты запросов через ASGI: чтение обрабатывается асинхронно.
+ASGI_URLCONF = 'foodgram_backend.asgi_urls'
 
 TEMPLATES = [
     {
@@ -77,6 +82,36 @@ if DEBUG:
         }
     }
 
+# Кэш должен быть общим для всех воркеров и контейнеров backend:
+# через него передаются версии данных для сброса кэшей в памяти
+# процессов. Файловый кэш просматривает весь каталог при каждой
+# записи, поэтому вне отладки нужен Redis или Memcached.
+SHARED_CACHE_BACKENDS = (
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', SHARED_CACHE_BACKENDS[0]),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://127.0.0.1:6379/0'),
+    }
+}
+if DEBUG and not os.getenv('CACHE_BACKEND'):
+    # Для runserver достаточно кэша процесса.
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+elif not DEBUG and CACHES['default']['BACKEND'] not in SHARED_CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        'CACHE_BACKEND должен быть общим кэшем: Redis или Memcached'
+    )
+
+# Без токена метрики доступны только с локального адреса.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,10 +152,14 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ),
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
 }
 
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
@@ -1,10 +1,16 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 
-from api.utils import get_short_url
+from api.utils import get_short_url, get_metrics
+
+# Код содержит хотя бы одну букву, иначе он совпал бы со старой
+# ссылкой по числовому id рецепта.
+SHORT_CODE_PATTERN = r'^s/(?P<code>(?=[0-9]*[a-zA-Z])[0-9a-zA-Z]{7})/$'
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
-    path('s/<int:pk>/', get_short_url, name='short_url')
+    re_path(SHORT_CODE_PATTERN, get_short_url, name='short_url'),
+    path('s/<int:pk>/', get_short_url, name='legacy_short_url'),
+    path('metrics/', get_metrics, name='metrics')
 ]
@@ -1,8 +1,16 @@
+import json
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import Group
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
 
-from core.constants import INLINE_EXTRA_FIELDS, MIN_NUM
+from core.constants import (
+    INLINE_EXTRA_FIELDS, MIN_NUM, ADMIN_COUNT_ESTIMATE_THRESHOLD
+)
 from .models import (
     User, Recipe, Ingredient, Tag, Subscription,
     IngredientRecipe, FavoriteRecipe, ShoppingCart
@@ -13,45 +21,92 @@ admin.site.unregister(Group)
 admin.site.empty_value_display = '-пусто-'
 
 
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор с оценкой количества объектов.
+
+    На PostgreSQL количество строк берется из плана запроса
+    (EXPLAIN), то есть из статистики планировщика. Точный
+    COUNT(*) выполняется, только если оценка не превышает
+    ADMIN_COUNT_ESTIMATE_THRESHOLD.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = self.get_estimated_count()
+        if estimate is not None and estimate > ADMIN_COUNT_ESTIMATE_THRESHOLD:
+            return estimate
+        return super().count
+
+    def get_estimated_count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return None
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = self.object_list.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]['Plan']['Plan Rows']
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список объектов большой таблицы без точного подсчета строк."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 class RecipeIngredientsInline(admin.TabularInline):
 
     model = IngredientRecipe
     extra = INLINE_EXTRA_FIELDS
     min_num = MIN_NUM
     can_delete = False
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'ingredient', 'recipe'
+        )
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
 
-    list_display = ('name', 'author', 'favorite_count')
+    list_display = ('name', 'author', 'favorites_count')
+    list_select_related = ('author',)
     search_fields = ('name', 'author__username')
-    readonly_fields = ('pub_date',)
+    readonly_fields = ('pub_date', 'favorites_count')
     list_filter = ('tags',)
-    autocomplete_fields = ('tags',)
+    autocomplete_fields = ('author', 'tags')
     save_on_top = True
     inlines = (RecipeIngredientsInline,)
 
-    @admin.display(description='У пользователей в избранном')
-    def favorite_count(self, obj):
-        return obj.recipes_in_favorite.count()
-
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
 
-    list_display = ('username', 'email')
+    list_display = (
+        'username', 'email', 'recipes_count', 'subscribers_count'
+    )
     search_fields = ('username', 'email')
     list_display_links = ('username',)
     readonly_fields = ('groups', 'user_permissions',)
     save_on_top = True
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
+class SubscriptionAdmin(LargeTableAdmin):
 
     list_display = ('author', 'user')
+    list_select_related = ('author', 'user')
     search_fields = ('^author__username',)
+    raw_id_fields = ('author', 'user')
 
 
 @admin.register(Ingredient)
@@ -74,14 +129,18 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(FavoriteRecipe)
-class FavoriteRecipeAdmin(admin.ModelAdmin):
+class FavoriteRecipeAdmin(LargeTableAdmin):
 
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
     search_fields = ('^user__username',)
+    raw_id_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
 
     list_display = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
     search_fields = ('^user__username',)
+    raw_id_fields = ('user', 'recipe')
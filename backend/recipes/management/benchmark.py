@@ -0,0 +1,242 @@
+"""Воспроизведение запросов Postman-коллекции для замера
+времени ответа и количества SQL запросов.
+"""
+import json
+import re
+import statistics
+import time
+from http import HTTPStatus
+
+import requests
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+VARIABLE_PATTERN = re.compile(r'{{(\w+)}}')
+EXPECTED_STATUS_PATTERN = re.compile(
+    r'pm\.response\.status,[^)]*\)\.to\.be\.eql\("([\w ]+)"\)'
+)
+SET_VARIABLE_PATTERN = re.compile(
+    r'pm\.collectionVariables\.set\(["\'](\w+)["\'],\s*(.+?)\);?$'
+)
+GET_VALUE_PATTERN = re.compile(
+    r'const (\w+) = _\.get\(responseData, "(\w+)"\)'
+)
+RESPONSE_ITEM_PATTERN = re.compile(
+    r'^responseData\[(\d+)\]\.(\w+)(\.slice\((\d+),\s*(\d+)\))?$'
+)
+# Переменные с данными пользователей, которые уникальны для каждого
+# прохода коллекции, чтобы параллельные проходы не пересекались.
+USERNAME_VARIABLES = ('username', 'secondUserUsername', 'thirdUserUsername')
+EMAIL_VARIABLES = ('email', 'secondUserEmail', 'thirdUserEmail')
+STATUS_CODES = {status.phrase: status.value for status in HTTPStatus}
+
+
+class CollectionRequest:
+    """Запрос Postman-коллекции."""
+
+    def __init__(self, name, item, auth):
+        request = item['request']
+        self.name = name
+        self.method = request['method']
+        url = request['url']
+        self.url = url['raw'] if isinstance(url, dict) else url
+        body = request.get('body') or {}
+        self.body = body.get('raw') if body.get('mode') == 'raw' else None
+        auth = request.get('auth', auth) or {}
+        self.auth_header = None
+        if auth.get('type') == 'apikey':
+            params = {
+                param['key']: param['value'] for param in auth['apikey']
+            }
+            self.auth_header = params.get('value')
+        script = '\n'.join(
+            line for event in item.get('event', ())
+            if event['listen'] == 'test'
+            for line in event['script']['exec']
+        )
+        expected = EXPECTED_STATUS_PATTERN.search(script)
+        self.expected_status = expected and STATUS_CODES.get(
+            expected.group(1)
+        )
+        self.response_values = dict(
+            (name, key) for name, key in GET_VALUE_PATTERN.findall(script)
+        )
+        self.variables = [
+            match.groups() for match in map(
+                SET_VARIABLE_PATTERN.search, script.splitlines()
+            ) if match
+        ]
+
+    @staticmethod
+    def substitute(value, variables):
+        return VARIABLE_PATTERN.sub(
+            lambda match: str(variables.get(match.group(1), match.group(0))),
+            value
+        )
+
+    def prepare(self, variables):
+        """Путь, тело и заголовок авторизации запроса."""
+        path = self.substitute(self.url, {**variables, 'baseUrl': ''})
+        body = self.body and self.substitute(self.body, variables)
+        auth = self.auth_header and self.substitute(
+            self.auth_header, variables
+        )
+        return path, body, auth
+
+    def update_variables(self, response_data, variables):
+        """Сохранение значений из ответа, как это делают
+        тестовые скрипты коллекции.
+        """
+        for name, expression in self.variables:
+            try:
+                if expression in self.response_values:
+                    value = response_data[self.response_values[expression]]
+                else:
+                    match = RESPONSE_ITEM_PATTERN.match(expression)
+                    if match is None:
+                        continue
+                    index, key, _, start, end = match.groups()
+                    value = response_data[int(index)][key]
+                    if start is not None:
+                        value = value[int(start):int(end)]
+            except (LookupError, TypeError):
+                continue
+            variables[name] = value
+
+
+def load_collection(path):
+    """Список запросов коллекции в порядке выполнения."""
+    with open(path, encoding='utf-8') as file:
+        collection = json.load(file)
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', ())
+    }
+    collection_items = []
+
+    def walk(items, prefix, auth):
+        for item in items:
+            name = f'{prefix}{item["name"].strip()}'
+            if 'item' in item:
+                walk(item['item'], f'{name}/', item.get('auth', auth))
+            else:
+                collection_items.append(CollectionRequest(name, item, auth))
+
+    walk(collection['item'], '', collection.get('auth'))
+    return collection_items, variables
+
+
+def unique_variables(variables, run_id):
+    """Копия переменных с уникальными именами и почтой пользователей."""
+    variables = dict(variables)
+    for name in USERNAME_VARIABLES:
+        variables[name] = variables[name][:-1] + f'-{run_id}"'
+    for name in EMAIL_VARIABLES:
+        variables[name] = f'"{run_id}.' + variables[name][1:]
+    return variables
+
+
+class DjangoClientTransport:
+    """Выполнение запросов тестовым клиентом Django в текущем процессе."""
+
+    def __init__(self, host):
+        self.client = Client(raise_request_exception=False, HTTP_HOST=host)
+
+    def send(self, method, path, body, auth):
+        headers = {'HTTP_AUTHORIZATION': auth} if auth else {}
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = self.client.generic(
+                method, path, body or '',
+                content_type='application/json', **headers
+            )
+            content = response.getvalue()
+            duration = time.perf_counter() - start
+        return response.status_code, content, duration, len(queries)
+
+    def close(self):
+        connection.close()
+
+
+class HTTPTransport:
+    """Выполнение запросов к запущенному серверу."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def send(self, method, path, body, auth):
+        headers = {'Content-Type': 'application/json'}
+        if auth:
+            headers['Authorization'] = auth
+        start = time.perf_counter()
+        response = self.session.request(
+            method, f'{self.base_url}{path}',
+            data=body and body.encode(), headers=headers
+        )
+        duration = time.perf_counter() - start
+        return response.status_code, response.content, duration, None
+
+    def close(self):
+        self.session.close()
+
+
+def run_collection(transport, items, variables, record):
+    """Проход коллекции. Возвращает имена созданных пользователей."""
+    for request in items:
+        path, body, auth = request.prepare(variables)
+        status, content, duration, queries = transport.send(
+            request.method, path, body, auth
+        )
+        record(request, status, duration, queries)
+        try:
+            response_data = json.loads(content)
+        except ValueError:
+            continue
+        request.update_variables(response_data, variables)
+    return [variables[name].strip('"') for name in USERNAME_VARIABLES]
+
+
+def percentile(quantiles, value):
+    return round(quantiles[value - 1] * 1000, 3)
+
+
+def summarize(samples, elapsed):
+    """Статистика по каждому запросу коллекции."""
+    summary = {}
+    for name, (method, durations, queries, unexpected) in samples.items():
+        if not durations:
+            continue
+        quantiles = (
+            statistics.quantiles(durations, n=100, method='inclusive')
+            if len(durations) > 1 else durations * 99
+        )
+        summary[name] = {
+            'method': method,
+            'count': len(durations),
+            'unexpected_status': unexpected,
+            'requests_per_second': round(len(durations) / sum(durations), 2),
+            'latency_ms': {
+                'mean': round(statistics.fmean(durations) * 1000, 3),
+                'p50': percentile(quantiles, 50),
+                'p95': percentile(quantiles, 95),
+                'p99': percentile(quantiles, 99),
+            },
+            'queries': {
+                'mean': round(statistics.fmean(queries), 2),
+                'max': max(queries),
+            } if queries else None,
+        }
+    total = sum(len(sample[1]) for sample in samples.values())
+    return {
+        'requests': summary,
+        'total': {
+            'count': total,
+            'elapsed_s': round(elapsed, 3),
+            'throughput_rps': round(total / elapsed, 2) if elapsed else None,
+            'unexpected_status': sum(
+                sample[3] for sample in samples.values()
+            ),
+        },
+    }
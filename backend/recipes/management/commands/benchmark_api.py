@@ -0,0 +1,203 @@
+"""
+Команда замера производительности API по Postman-коллекции:
+python manage.py benchmark_api [--iterations 5] [--concurrency 1]
+[--warmup 1] [--url http://127.0.0.1:8000] [--output report.json]
+[--compare baseline.json] [--allow-production].
+
+Без --url запросы выполняются тестовым клиентом Django в текущем
+процессе, и для каждого запроса считается количество SQL запросов.
+С --url запросы отправляются запущенному серверу (например, gunicorn),
+использующему ту же БД. Каждый проход коллекции создает собственных
+пользователей и удаляет их после завершения. При DEBUG=False команда
+запускается только с --allow-production.
+"""
+import json
+import subprocess
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from recipes.management.benchmark import (
+    DjangoClientTransport, HTTPTransport, load_collection,
+    unique_variables, run_collection, summarize
+)
+from recipes.models import User
+
+
+def get_revision():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_change(old, new):
+    if old is None or new is None:
+        return f'{old} -> {new}'
+    change = (new - old) / old * 100 if old else 0
+    return f'{old} -> {new} ({change:+.1f}%)'
+
+
+class Command(BaseCommand):
+    """Класс замера производительности API."""
+
+    help = 'Замер производительности API по Postman-коллекции'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--collection',
+            default=(
+                f'{settings.BASE_DIR.parent}/postman_collection/'
+                'foodgram.postman_collection.json'
+            ),
+            help='Путь к Postman-коллекции'
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=5,
+            help='Количество замеряемых проходов коллекции на поток'
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Количество параллельных потоков'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=1,
+            help='Количество незамеряемых проходов на поток'
+        )
+        parser.add_argument(
+            '--url', help='Адрес запущенного сервера'
+        )
+        parser.add_argument(
+            '--output', help='Файл для сохранения отчета в JSON'
+        )
+        parser.add_argument(
+            '--compare', help='Отчет для сравнения с текущим замером'
+        )
+        parser.add_argument(
+            '--allow-production', action='store_true',
+            help='Разрешить запуск при DEBUG=False'
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['allow_production']:
+            raise CommandError(
+                'Замер создает и удаляет пользователей в БД. При '
+                'DEBUG=False запустите команду с --allow-production'
+            )
+        self.items, self.variables = load_collection(options['collection'])
+        self.options = options
+        self.run_prefix = uuid.uuid4().hex[:6]
+        self.lock = Lock()
+        self.samples = {
+            item.name: [item.method, [], [], 0] for item in self.items
+        }
+        self.run_phase(options['warmup'], 'warmup', record=False)
+        start = time.monotonic()
+        self.run_phase(options['iterations'], 'run', record=True)
+        report = {
+            'revision': get_revision(),
+            'target': options['url'] or 'django-client',
+            'iterations': options['iterations'],
+            'concurrency': options['concurrency'],
+            **summarize(self.samples, time.monotonic() - start),
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+            self.stdout.write(self.style.SUCCESS(
+                f'Отчет сохранен в {options["output"]}'
+            ))
+        else:
+            self.stdout.write(output)
+        total = report['total']
+        self.stdout.write(self.style.SUCCESS(
+            f'Выполнено {total["count"]} запросов за {total["elapsed_s"]} с '
+            f'({total["throughput_rps"]} запросов/с)'
+        ))
+        if total['unexpected_status']:
+            self.stdout.write(self.style.WARNING(
+                f'Неожиданный статус ответа: {total["unexpected_status"]}'
+            ))
+        if options['compare']:
+            self.compare(options['compare'], report)
+
+    def run_phase(self, iterations, phase, record):
+        with ThreadPoolExecutor(self.options['concurrency']) as executor:
+            for future in [
+                executor.submit(self.run_worker, worker, iterations,
+                                phase, record)
+                for worker in range(self.options['concurrency'])
+            ]:
+                future.result()
+
+    def run_worker(self, worker, iterations, phase, record):
+        transport = (
+            HTTPTransport(self.options['url']) if self.options['url']
+            else DjangoClientTransport(settings.ALLOWED_HOSTS[0].replace(
+                '*', 'localhost'
+            ))
+        )
+        try:
+            for iteration in range(iterations):
+                usernames = run_collection(
+                    transport, self.items,
+                    unique_variables(
+                        self.variables,
+                        f'{self.run_prefix}{phase[0]}{worker}x{iteration}'
+                    ),
+                    self.record if record else lambda *args: None
+                )
+                User.objects.filter(username__in=usernames).delete()
+        finally:
+            transport.close()
+
+    def record(self, item, status, duration, queries):
+        with self.lock:
+            sample = self.samples[item.name]
+            sample[1].append(duration)
+            if queries is not None:
+                sample[2].append(queries)
+            if item.expected_status and status != item.expected_status:
+                sample[3] += 1
+
+    def compare(self, path, report):
+        """Вывод изменения задержки и количества запросов к БД."""
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        self.stdout.write(
+            f'Сравнение {baseline.get("revision")} -> {report["revision"]}'
+        )
+        for name, current in report['requests'].items():
+            previous = baseline['requests'].get(name)
+            if previous is None:
+                continue
+            line = (
+                f'{name}: p50 '
+                + format_change(
+                    previous['latency_ms']['p50'], current['latency_ms']['p50']
+                )
+                + ', p95 '
+                + format_change(
+                    previous['latency_ms']['p95'], current['latency_ms']['p95']
+                )
+            )
+            if previous['queries'] and current['queries']:
+                line += ', SQL ' + format_change(
+                    previous['queries']['mean'], current['queries']['mean']
+                )
+            self.stdout.write(line)
+        self.stdout.write(
+            'Пропускная способность: ' + format_change(
+                baseline['total']['throughput_rps'],
+                report['total']['throughput_rps']
+            )
+        )
@@ -1,26 +1,234 @@
 """
 Команда загрузки CSV файлов в БД:
-python manage.py load_csv.
+python manage.py load_csv [--batch-size 5000] [--dry-run] [--path data].
+
+На PostgreSQL файл передается через COPY во временную таблицу
+и переносится одним INSERT ... ON CONFLICT DO NOTHING,
+на остальных БД строки вставляются пакетами через executemany.
 """
 import csv
+from itertools import islice
 
 from django.conf import settings
 from django.core.management import BaseCommand
+from django.db import connection, transaction
+
+from recipes.models import Recipe, Ingredient, Tag
+from recipes.utils import bump_model_version, refresh_recipe_tags_masks
+
+DEFAULT_BATCH_SIZE = 5000
 
-from recipes.models import Recipe, Tag
+
+def quote(name):
+    return connection.ops.quote_name(name)
 
 
 class Command(BaseCommand):
     """Класс загрузки CSV файлов в БД."""
 
-    def handle(self, *args, **kwargs):
-        try:
-            with open(f'{settings.BASE_DIR}/data/recipetag.csv') as csv_file:
-                rows = csv.DictReader(csv_file)
-                for row in rows:
-                    Recipe(pk=row['recipe_id']).tags.add(Tag(pk=row['tag_id']))
-                self.stdout.write(
-                    self.style.SUCCESS('Данные модели RecipeTag загружены')
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество строк, вставляемых одним запросом'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Проверить файлы и посчитать дубликаты без записи в БД'
+        )
+        parser.add_argument(
+            '--path', default=f'{settings.BASE_DIR}/data',
+            help='Каталог с CSV файлами'
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.is_postgresql = connection.vendor == 'postgresql'
+        for model_name, csv_file, load in (
+            ('Ingredient', 'ingredients.csv', self.load_ingredients),
+            ('RecipeTag', 'recipetag.csv', self.load_recipe_tags),
+        ):
+            try:
+                with open(
+                    f'{options["path"]}/{csv_file}', encoding='utf-8'
+                ) as file, transaction.atomic():
+                    stats = load(file)
+                    if options['dry_run']:
+                        transaction.set_rollback(True)
+            except Exception as error:
+                self.stdout.write(self.style.ERROR(
+                    f'Ошибка загрузки данных модели {model_name} - {error}'
+                ))
+                continue
+            self.report(model_name, stats, options['dry_run'])
+        if not options['dry_run']:
+            # Связи с тегами вставлены в обход сигнала m2m_changed.
+            refresh_recipe_tags_masks()
+            bump_model_version(Ingredient)
+
+    def report(self, model_name, stats, dry_run):
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Будет загружено" if dry_run else "Загружено"} '
+            f'{stats["inserted"]} из {stats["total"]} '
+            f'строк для модели {model_name}'
+        ))
+        if stats['file_duplicates'] or stats['existing']:
+            self.stdout.write(self.style.WARNING(
+                f'Дубликатов в файле: {stats["file_duplicates"]}, '
+                f'уже есть в БД: {stats["existing"]}'
+            ))
+        if stats.get('missing'):
+            self.stdout.write(self.style.WARNING(
+                f'Ссылаются на несуществующие объекты: {stats["missing"]}'
+            ))
+
+    def load_ingredients(self, file):
+        """Загрузка ингредиентов. Дубликаты определяются
+        по ограничению unique_name_measurement_unit.
+        """
+        table = quote(Ingredient._meta.db_table)
+        if self.is_postgresql:
+            with connection.cursor() as cursor:
+                self.copy_to_staging(cursor, file, (
+                    ('name', 'varchar(256)'),
+                    ('measurement_unit', 'varchar(256)'),
+                ))
+                total, distinct = self.count_staging(
+                    cursor, 'name, measurement_unit'
+                )
+                cursor.execute(
+                    f'INSERT INTO {table} (name, measurement_unit) '
+                    'SELECT DISTINCT name, measurement_unit FROM staging '
+                    'ON CONFLICT ON CONSTRAINT unique_name_measurement_unit '
+                    'DO NOTHING'
+                )
+                inserted = cursor.rowcount
+            return {
+                'total': total, 'inserted': inserted,
+                'file_duplicates': total - distinct,
+                'existing': distinct - inserted
+            }
+        stats = {'total': 0, 'inserted': 0, 'file_duplicates': 0}
+        seen = set()
+        rows = (
+            (row['name'], row['measurement_unit'])
+            for row in csv.DictReader(file)
+        )
+        with connection.cursor() as cursor:
+            for batch in self.iter_batches(rows):
+                stats['total'] += len(batch)
+                unique_rows = []
+                for row in batch:
+                    if row in seen:
+                        stats['file_duplicates'] += 1
+                    else:
+                        seen.add(row)
+                        unique_rows.append(row)
+                cursor.executemany(
+                    f'INSERT INTO {table} (name, measurement_unit) '
+                    'VALUES (%s, %s) ON CONFLICT DO NOTHING',
+                    unique_rows
                 )
-        except Exception as error:
-            self.stdout.write(self.style.ERROR(f'Ошибка {error}'))
+                stats['inserted'] += max(cursor.rowcount, 0)
+        stats['existing'] = len(seen) - stats['inserted']
+        return stats
+
+    def load_recipe_tags(self, file):
+        """Загрузка связей рецептов с тегами."""
+        table = quote(Recipe.tags.through._meta.db_table)
+        if self.is_postgresql:
+            recipe_table = quote(Recipe._meta.db_table)
+            tag_table = quote(Tag._meta.db_table)
+            with connection.cursor() as cursor:
+                self.copy_to_staging(cursor, file, (
+                    ('id', 'bigint'),
+                    ('recipe_id', 'bigint'),
+                    ('tag_id', 'bigint'),
+                ))
+                total, distinct = self.count_staging(
+                    cursor, 'recipe_id, tag_id'
+                )
+                cursor.execute(
+                    'SELECT count(*) FROM ('
+                    'SELECT DISTINCT recipe_id, tag_id FROM staging s '
+                    f'WHERE NOT EXISTS (SELECT 1 FROM {recipe_table} '
+                    'WHERE id = s.recipe_id) '
+                    f'OR NOT EXISTS (SELECT 1 FROM {tag_table} '
+                    'WHERE id = s.tag_id)) missing'
+                )
+                missing = cursor.fetchone()[0]
+                cursor.execute(
+                    f'INSERT INTO {table} (recipe_id, tag_id) '
+                    'SELECT DISTINCT s.recipe_id, s.tag_id FROM staging s '
+                    f'JOIN {recipe_table} r ON r.id = s.recipe_id '
+                    f'JOIN {tag_table} t ON t.id = s.tag_id '
+                    'ON CONFLICT (recipe_id, tag_id) DO NOTHING'
+                )
+                inserted = cursor.rowcount
+            return {
+                'total': total, 'inserted': inserted, 'missing': missing,
+                'file_duplicates': total - distinct,
+                'existing': distinct - missing - inserted
+            }
+        stats = {
+            'total': 0, 'inserted': 0, 'missing': 0, 'file_duplicates': 0
+        }
+        seen = set()
+        rows = (
+            (int(row['recipe_id']), int(row['tag_id']))
+            for row in csv.DictReader(file)
+        )
+        with connection.cursor() as cursor:
+            for batch in self.iter_batches(rows):
+                stats['total'] += len(batch)
+                recipe_ids = set(Recipe.objects.filter(
+                    id__in={recipe_id for recipe_id, _ in batch}
+                ).values_list('id', flat=True))
+                tag_ids = set(Tag.objects.filter(
+                    id__in={tag_id for _, tag_id in batch}
+                ).values_list('id', flat=True))
+                unique_rows = []
+                for row in batch:
+                    if row in seen:
+                        stats['file_duplicates'] += 1
+                        continue
+                    seen.add(row)
+                    if row[0] in recipe_ids and row[1] in tag_ids:
+                        unique_rows.append(row)
+                    else:
+                        stats['missing'] += 1
+                cursor.executemany(
+                    f'INSERT INTO {table} (recipe_id, tag_id) '
+                    'VALUES (%s, %s) ON CONFLICT DO NOTHING',
+                    unique_rows
+                )
+                stats['inserted'] += max(cursor.rowcount, 0)
+        stats['existing'] = len(seen) - stats['missing'] - stats['inserted']
+        return stats
+
+    def iter_batches(self, rows):
+        while batch := list(islice(rows, self.batch_size)):
+            yield batch
+
+    @staticmethod
+    def copy_to_staging(cursor, file, columns):
+        """Копирование CSV файла во временную таблицу staging."""
+        cursor.execute(
+            'CREATE TEMPORARY TABLE staging ('
+            + ', '.join(f'{name} {type}' for name, type in columns)
+            + ') ON COMMIT DROP'
+        )
+        cursor.copy_expert(
+            'COPY staging ('
+            + ', '.join(name for name, _ in columns)
+            + ') FROM STDIN WITH (FORMAT csv, HEADER true)',
+            file
+        )
+
+    @staticmethod
+    def count_staging(cursor, fields):
+        cursor.execute(
+            'SELECT count(*), '
+            f'(SELECT count(*) FROM (SELECT DISTINCT {fields} FROM staging) '
+            'unique_rows) FROM staging'
+        )
+        return cursor.fetchone()
@@ -1,64 +1,141 @@
 """
 Команда загрузки Json файлов в БД:
-python manage.py load_json.
+python manage.py load_json [--batch-size 1000] [--path data].
 """
 import json
+import time
+from itertools import islice
 
 from django.conf import settings
-from django.db.utils import IntegrityError
+from django.contrib.auth.hashers import identify_hasher, make_password
 from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.utils import IntegrityError
 
 from recipes.models import User, Ingredient, Tag, Recipe, IngredientRecipe
+from recipes.search import rebuild_search_index
+from recipes.utils import bump_model_version, reconcile_counters
 
 MODELS_JSONFILES = {
     User: 'users.json', Ingredient: 'ingredients.json', Tag: 'tags.json',
     Recipe: 'recipes.json', IngredientRecipe: 'ingredientrecipe.json'
 }
+# Поля, по которым определяется, что объект уже есть в БД.
+NATURAL_KEYS = {
+    User: ('username',),
+    Ingredient: ('name', 'measurement_unit'),
+    Tag: ('slug',),
+    Recipe: ('author_id', 'name'),
+    IngredientRecipe: ('recipe_id', 'ingredient_id'),
+}
+# Внешние ключи ссылаются на порядковый номер объекта в файле.
+FOREIGN_KEYS = {
+    Recipe: {'author_id': User},
+    IngredientRecipe: {'recipe_id': Recipe, 'ingredient_id': Ingredient},
+}
+READ_CHUNK_SIZE = 64 * 1024
+DEFAULT_BATCH_SIZE = 1000
+
+
+def iter_json_array(file):
+    """Построчное чтение объектов из JSON массива без загрузки
+    всего файла в память.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(READ_CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while (
+                position < len(buffer) and buffer[position] in ' \t\r\n,'
+            ):
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise ValueError('Файл должен содержать JSON массив')
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            yield item
+        if not chunk:
+            return
+
+
+def prepare_user(item):
+    """Хэширование пароля пользователя, если он задан открытым текстом."""
+    try:
+        identify_hasher(item['password'])
+    except ValueError:
+        item['password'] = make_password(item['password'])
+    return item
 
 
 class Command(BaseCommand):
     """Класс загрузки Json файлов в БД."""
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество объектов, создаваемых одним запросом'
+        )
+        parser.add_argument(
+            '--path', default=f'{settings.BASE_DIR}/data',
+            help='Каталог с JSON файлами'
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.id_maps = {
+            related_model: {}
+            for foreign_keys in FOREIGN_KEYS.values()
+            for related_model in foreign_keys.values()
+        }
         success_message_list = []
         warning_message_list = []
         for model, json_file in MODELS_JSONFILES.items():
             model_name = model.__name__
+            start = time.monotonic()
             try:
                 with open(
-                    f'{settings.BASE_DIR}/data/{json_file}',
-                    'r', encoding='utf-8'
+                    f'{options["path"]}/{json_file}', 'r', encoding='utf-8'
                 ) as file:
-                    data = json.loads(file.read())
-                    not_create_count = 0
-                    for i, item in enumerate(data):
-                        if model == User:
-                            password = item.pop('password')
-                            user = User.objects.filter(**item)
-                            if not user.exists():
-                                User.objects.create_user(
-                                    **item, password=password
-                                )
-                            else:
-                                not_create_count += 1
-                        else:
-                            _, is_create = model.objects.get_or_create(**item)
-                            if not is_create:
-                                not_create_count += 1
-                    success_message_list.append(
-                        f'Загружено {i + 1 - not_create_count} '
-                        f'объектов для модели {model_name}'
-                    )
-                    warning_message_list.append(
-                        f'Не загружено {not_create_count} '
-                        f'объектов для модели {model_name}'
+                    created_count, not_create_count = self.load_model(
+                        model, iter_json_array(file)
                     )
+                bump_model_version(model)
+                elapsed = time.monotonic() - start
+                total = created_count + not_create_count
+                success_message_list.append(
+                    f'Загружено {created_count} '
+                    f'объектов для модели {model_name} '
+                    f'({total / max(elapsed, 1e-6):.0f} объектов/с, '
+                    f'{elapsed:.2f} с)'
+                )
+                warning_message_list.append(
+                    f'Не загружено {not_create_count} '
+                    f'объектов для модели {model_name}'
+                )
             except IntegrityError as error:
                 self.stdout.write(self.style.ERROR(
                     f'Ошибка загрузки данных модели {model_name} - {error}'
                 ))
             except Exception as error:
                 self.stdout.write(self.style.ERROR(f'Ошибка {error}'))
+        # Объекты созданы через bulk_create без сигналов.
+        reconcile_counters()
+        rebuild_search_index()
 
         [
             self.stdout.write(
@@ -70,3 +147,66 @@ class Command(BaseCommand):
                 self.style.WARNING(i)
             ) for i in warning_message_list
         ]
+
+    def load_model(self, model, items):
+        created_count = not_create_count = 0
+        source_id = 0
+        while True:
+            batch = []
+            for item in islice(items, self.batch_size):
+                source_id += 1
+                item = self.resolve_foreign_keys(model, item)
+                if item is None:
+                    not_create_count += 1
+                    continue
+                batch.append((source_id, item))
+            if not batch:
+                return created_count, not_create_count
+            created = self.load_batch(model, batch)
+            created_count += created
+            not_create_count += len(batch) - created
+
+    def resolve_foreign_keys(self, model, item):
+        for field, related_model in FOREIGN_KEYS.get(model, {}).items():
+            related_id = self.id_maps[related_model].get(item[field])
+            if related_id is None:
+                return None
+            item[field] = related_id
+        return item
+
+    def get_existing_ids(self, model, items):
+        key_fields = NATURAL_KEYS[model]
+        existing = model.objects.filter(**{
+            f'{field}__in': {item[field] for item in items}
+            for field in key_fields
+        }).values_list('pk', *key_fields)
+        return {tuple(key): pk for pk, *key in existing}
+
+    @transaction.atomic
+    def load_batch(self, model, batch):
+        key_fields = NATURAL_KEYS[model]
+        existing_ids = self.get_existing_ids(
+            model, [item for _, item in batch]
+        )
+        new_objects = {}
+        for _, item in batch:
+            key = tuple(item[field] for field in key_fields)
+            if key not in existing_ids and key not in new_objects:
+                if model == User:
+                    item = prepare_user(item)
+                new_objects[key] = model(**item)
+        model.objects.bulk_create(
+            new_objects.values(), ignore_conflicts=True
+        )
+        if model not in self.id_maps:
+            return len(new_objects)
+        if new_objects:
+            existing_ids.update(self.get_existing_ids(
+                model, [item for _, item in batch]
+            ))
+        id_map = self.id_maps[model]
+        for source_id, item in batch:
+            key = tuple(item[field] for field in key_fields)
+            if key in existing_ids:
+                id_map[source_id] = existing_ids[key]
+        return len(new_objects)
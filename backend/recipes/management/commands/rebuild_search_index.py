@@ -0,0 +1,30 @@
+"""
+Команда перестроения поискового индекса рецептов:
+python manage.py rebuild_search_index [--batch-size N].
+"""
+import time
+
+from django.core.management import BaseCommand
+
+from core.constants import SEARCH_INDEX_BATCH_SIZE
+from recipes.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    """Класс перестроения поискового индекса рецептов."""
+
+    help = 'Перестроение поискового индекса рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=SEARCH_INDEX_BATCH_SIZE,
+            help='Количество рецептов, обновляемых одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        refreshed = rebuild_search_index(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано {refreshed} рецептов '
+            f'за {time.monotonic() - start:.2f} с'
+        ))
@@ -0,0 +1,70 @@
+"""
+Команда пересчета ингредиентов в корзинах пользователей:
+python manage.py rebuild_shopping_cart [--check].
+"""
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingCartIngredient
+from recipes.utils import get_shopping_cart_totals
+
+
+class Command(BaseCommand):
+    """Класс пересчета ингредиентов в корзинах пользователей."""
+
+    help = 'Пересчет ингредиентов в корзинах пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, не изменяя данные'
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            self.check_drift()
+        else:
+            self.rebuild()
+
+    def check_drift(self):
+        expected = {
+            (item['user'], item['ingredient']): item['total_amount']
+            for item in get_shopping_cart_totals().iterator()
+        }
+        actual = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount in (
+                ShoppingCartIngredient.objects.values_list(
+                    'user_id', 'ingredient_id', 'total_amount'
+                ).iterator()
+            )
+        }
+        missing = expected.keys() - actual.keys()
+        extra = actual.keys() - expected.keys()
+        wrong = [
+            key for key in expected.keys() & actual.keys()
+            if expected[key] != actual[key]
+        ]
+        if not (missing or extra or wrong):
+            self.stdout.write(self.style.SUCCESS('Расхождений не найдено'))
+            return
+        self.stdout.write(self.style.WARNING(
+            f'Отсутствует записей: {len(missing)}, '
+            f'лишних записей: {len(extra)}, '
+            f'с неверным количеством: {len(wrong)}'
+        ))
+
+    @transaction.atomic
+    def rebuild(self):
+        ShoppingCartIngredient.objects.all().delete()
+        created = ShoppingCartIngredient.objects.bulk_create(
+            ShoppingCartIngredient(
+                user_id=item['user'],
+                ingredient_id=item['ingredient'],
+                total_amount=item['total_amount']
+            ) for item in get_shopping_cart_totals().iterator()
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано {len(created)} записей'
+        ))
@@ -0,0 +1,34 @@
+"""
+Команда сверки счетчиков рецептов автора, подписчиков и избранного
+с фактическим количеством связей:
+python manage.py reconcile_counters [--check].
+"""
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from recipes.utils import reconcile_counters
+
+
+class Command(BaseCommand):
+    """Класс сверки счетчиков."""
+
+    help = 'Сверка счетчиков с фактическим количеством связей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только проверить расхождения, не изменяя данные'
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        drift = reconcile_counters(check=options['check'])
+        if not any(drift.values()):
+            self.stdout.write(self.style.SUCCESS('Расхождений не найдено'))
+            return
+        action = 'Расходится' if options['check'] else 'Исправлено'
+        for counter, count in drift.items():
+            self.stdout.write(self.style.WARNING(
+                f'{action} значений {counter}: {count}'
+            ))
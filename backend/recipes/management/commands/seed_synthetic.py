@@ -0,0 +1,310 @@
+"""
+Команда генерации синтетических данных для нагрузочного тестирования:
+python manage.py seed_synthetic [--users 1000] [--recipes 10000]
+[--subscriptions 10] [--favorites 20] [--cart 5] [--seed 0]
+[--batch-size 5000] [--path data].
+
+Популярность авторов, рецептов, ингредиентов и тегов распределена
+по закону Ципфа, активность пользователей - по закону Парето.
+При одинаковом --seed на пустой БД создаются одинаковые данные.
+"""
+import csv
+import json
+import random
+import time
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, call_command
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from core.constants import MIN_VALUE
+from recipes.models import (
+    User, Recipe, Ingredient, Tag, IngredientRecipe,
+    Subscription, FavoriteRecipe, ShoppingCart
+)
+from recipes.utils import bump_model_version, refresh_recipe_tags_masks
+
+DEFAULT_BATCH_SIZE = 5000
+ZIPF_EXPONENT = 1.1
+PARETO_ALPHA = 2
+RECIPE_INGREDIENTS = (3, 15)
+RECIPE_TAGS = (1, 3)
+MAX_COOKING_TIME = 240
+MAX_AMOUNT = 1000
+SYNTHETIC_PASSWORD = 'synthetic-password'
+SYNTHETIC_IMAGE = 'recipes/images/synthetic.png'
+
+
+class ZipfSampler:
+    """Выборка элементов с вероятностью, обратной степени ранга."""
+
+    def __init__(self, population, rng, exponent=ZIPF_EXPONENT):
+        self.population = list(population)
+        self.rng = rng
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent
+            for rank in range(1, len(self.population) + 1)
+        ))
+
+    def sample(self, k, exclude=None):
+        """Выборка k различных элементов."""
+        k = min(k, len(self.population) - (exclude is not None))
+        result = []
+        seen = {exclude}
+        while len(result) < k:
+            for item in self.rng.choices(
+                self.population, cum_weights=self.cum_weights,
+                k=k - len(result)
+            ):
+                if item not in seen:
+                    seen.add(item)
+                    result.append(item)
+        return result
+
+
+class Command(BaseCommand):
+    """Класс генерации синтетических данных."""
+
+    help = 'Генерация синтетических данных с неравномерным распределением'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Количество пользователей'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=10000,
+            help='Количество рецептов'
+        )
+        parser.add_argument(
+            '--subscriptions', type=int, default=10,
+            help='Среднее количество подписок пользователя'
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Среднее количество избранных рецептов пользователя'
+        )
+        parser.add_argument(
+            '--cart', type=int, default=5,
+            help='Среднее количество рецептов в корзине пользователя'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help='Количество объектов, создаваемых одним запросом'
+        )
+        parser.add_argument(
+            '--path', default=f'{settings.BASE_DIR}/data',
+            help='Каталог с файлами ingredients.csv и tags.json'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        ingredients = self.load_ingredients(options['path'])
+        tags = self.load_tags(options['path'])
+        start = time.monotonic()
+        user_ids = self.create_users(options['users'])
+        authors = ZipfSampler(self.shuffled(user_ids), self.rng)
+        recipes = self.create_recipes(
+            options['recipes'], authors, ingredients
+        )
+        self.create_recipe_tags(recipes, tags)
+        self.create_recipe_ingredients(recipes, ingredients)
+        recipe_ids = [recipe_id for recipe_id, _ in recipes]
+        self.create_user_relations(
+            Subscription, 'author_id', user_ids, authors,
+            options['subscriptions'], exclude_self=True
+        )
+        recipe_sampler = ZipfSampler(self.shuffled(recipe_ids), self.rng)
+        self.create_user_relations(
+            FavoriteRecipe, 'recipe_id', user_ids, recipe_sampler,
+            options['favorites']
+        )
+        self.create_user_relations(
+            ShoppingCart, 'recipe_id', user_ids, recipe_sampler,
+            options['cart']
+        )
+        self.reset_sequences()
+        call_command('rebuild_shopping_cart', stdout=self.stdout)
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        for model in (Ingredient, Tag, Recipe):
+            bump_model_version(model)
+        self.stdout.write(self.style.SUCCESS(
+            f'Генерация завершена за {time.monotonic() - start:.2f} с'
+        ))
+
+    def shuffled(self, items):
+        items = list(items)
+        self.rng.shuffle(items)
+        return items
+
+    def skewed_count(self, mean, minimum=0, maximum=None):
+        """Количество связей пользователя с заданным средним."""
+        count = int(
+            self.rng.paretovariate(PARETO_ALPHA)
+            * mean * (PARETO_ALPHA - 1) / PARETO_ALPHA
+        )
+        count = max(count, minimum)
+        return count if maximum is None else min(count, maximum)
+
+    def bulk_create(self, model, objects):
+        """Пакетная вставка объектов с выводом скорости."""
+        start = time.monotonic()
+        count = 0
+        objects = iter(objects)
+        with transaction.atomic():
+            while batch := list(islice(objects, self.batch_size)):
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+                count += len(batch)
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {count} объектов для модели {model.__name__} '
+            f'({count / max(elapsed, 1e-6):.0f} объектов/с, '
+            f'{elapsed:.2f} с)'
+        ))
+
+    @staticmethod
+    def next_id(model):
+        return (model.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+
+    def load_ingredients(self, path):
+        """Словарь ингредиентов из data/ingredients.csv."""
+        with open(f'{path}/ingredients.csv', encoding='utf-8') as file:
+            vocabulary = {
+                (row['name'], row['measurement_unit'])
+                for row in csv.DictReader(file)
+            }
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in sorted(vocabulary)
+            ),
+            batch_size=self.batch_size, ignore_conflicts=True
+        )
+        ingredients = [
+            (ingredient_id, name)
+            for ingredient_id, name, measurement_unit in (
+                Ingredient.objects.order_by('id').values_list(
+                    'id', 'name', 'measurement_unit'
+                )
+            )
+            if (name, measurement_unit) in vocabulary
+        ]
+        return ZipfSampler(self.shuffled(ingredients), self.rng)
+
+    def load_tags(self, path):
+        if not Tag.objects.exists():
+            with open(f'{path}/tags.json', encoding='utf-8') as file:
+                Tag.objects.bulk_create(
+                    Tag(**item) for item in json.load(file)
+                )
+        return ZipfSampler(
+            self.shuffled(Tag.objects.order_by('id').values_list(
+                'id', flat=True
+            )),
+            self.rng
+        )
+
+    def create_users(self, count):
+        first_id = self.next_id(User)
+        user_ids = range(first_id, first_id + count)
+        password = make_password(SYNTHETIC_PASSWORD)
+        self.bulk_create(User, (
+            User(
+                id=user_id,
+                username=f'synthetic_{user_id}',
+                email=f'synthetic_{user_id}@example.com',
+                first_name='Пользователь',
+                last_name=str(user_id),
+                password=password
+            ) for user_id in user_ids
+        ))
+        return list(user_ids)
+
+    def create_recipes(self, count, authors, ingredients):
+        """Создание рецептов. Возвращает пары
+        (id рецепта, основной ингредиент).
+        """
+        first_id = self.next_id(Recipe)
+        recipes = [
+            (recipe_id, ingredients.sample(1)[0])
+            for recipe_id in range(first_id, first_id + count)
+        ]
+        self.bulk_create(Recipe, (
+            Recipe(
+                id=recipe_id,
+                author_id=authors.sample(1)[0],
+                name=f'{name.capitalize()} по-домашнему №{recipe_id}',
+                text=f'Синтетический рецепт №{recipe_id}.',
+                image=SYNTHETIC_IMAGE,
+                cooking_time=self.skewed_count(
+                    30, MIN_VALUE, MAX_COOKING_TIME
+                )
+            ) for recipe_id, (_, name) in recipes
+        ))
+        return recipes
+
+    def create_recipe_tags(self, recipes, tags):
+        RecipeTag = Recipe.tags.through
+        self.bulk_create(RecipeTag, (
+            RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id, _ in recipes
+            for tag_id in tags.sample(self.rng.randint(*RECIPE_TAGS))
+        ))
+        if recipes:
+            refresh_recipe_tags_masks(
+                Recipe.objects.filter(id__gte=recipes[0][0])
+            )
+
+    def create_recipe_ingredients(self, recipes, ingredients):
+        def recipe_ingredients(recipe_id, main_ingredient):
+            yield main_ingredient[0]
+            for ingredient_id, _ in ingredients.sample(
+                self.rng.randint(*RECIPE_INGREDIENTS) - 1,
+                exclude=main_ingredient
+            ):
+                yield ingredient_id
+
+        self.bulk_create(IngredientRecipe, (
+            IngredientRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=self.rng.randint(MIN_VALUE, MAX_AMOUNT)
+            )
+            for recipe_id, main_ingredient in recipes
+            for ingredient_id in recipe_ingredients(
+                recipe_id, main_ingredient
+            )
+        ))
+
+    def create_user_relations(
+        self, model, field, user_ids, sampler, mean, exclude_self=False
+    ):
+        """Создание подписок, избранного и корзин пользователей."""
+        self.bulk_create(model, (
+            model(user_id=user_id, **{field: related_id})
+            for user_id in user_ids
+            for related_id in sampler.sample(
+                self.skewed_count(mean),
+                exclude=user_id if exclude_self else None
+            )
+        ))
+
+    @staticmethod
+    def reset_sequences():
+        """Сдвиг последовательностей после вставки с явными id."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), (User, Recipe)
+        )
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
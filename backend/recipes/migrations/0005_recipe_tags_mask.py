@@ -0,0 +1,45 @@
+# Generated by Django 4.2.5 on 2026-10-18 06:00
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+TAGS_MASK_BITS = 63
+BATCH_SIZE = 5000
+
+
+def fill_tags_masks(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    masks = defaultdict(int)
+    for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+        tag_id__lt=TAGS_MASK_BITS
+    ).values_list('recipe_id', 'tag_id').iterator():
+        masks[recipe_id] |= 1 << tag_id
+    Recipe.objects.bulk_update(
+        (
+            Recipe(pk=recipe_id, tags_mask=mask)
+            for recipe_id, mask in masks.items()
+        ),
+        ('tags_mask',),
+        batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Битовая маска тегов'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.RunPython(fill_tags_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.5 on 2026-10-18 06:05
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('recipes', 'User')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for model, counter, related_model, field in (
+        (Recipe, 'favorites_count', 'FavoriteRecipe', 'recipe'),
+        (User, 'recipes_count', 'Recipe', 'author'),
+        (User, 'subscribers_count', 'Subscription', 'author'),
+    ):
+        related = apps.get_model('recipes', related_model)
+        model.objects.update(**{counter: Coalesce(
+            models.Subquery(
+                related.objects.filter(
+                    **{field: models.OuterRef('pk')}
+                ).order_by().values(field).annotate(
+                    count=models.Count('pk')
+                ).values('count')
+            ),
+            0
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_tags_mask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='У пользователей в избранном'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='subscribers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
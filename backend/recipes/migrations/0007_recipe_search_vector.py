@@ -0,0 +1,77 @@
+# Generated by Django 4.2.5 on 2026-10-18 06:10
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_CONFIG = 'russian'
+SQLITE_SEARCH_TABLE = 'recipes_recipe_search'
+
+INGREDIENT_NAMES = (
+    '(SELECT {aggregate} FROM recipes_ingredientrecipe AS ingredient_recipe '
+    'JOIN recipes_ingredient AS ingredient '
+    'ON ingredient.id = ingredient_recipe.ingredient_id '
+    'WHERE ingredient_recipe.recipe_id = recipe.id)'
+)
+
+
+def create_search_index(apps, schema_editor):
+    """Индекс GIN в PostgreSQL или теневая таблица FTS5 в SQLite.
+
+    Индексы создаются вне состояния моделей: в других базах данных
+    их нет.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        ingredient_names = INGREDIENT_NAMES.format(
+            aggregate="string_agg(ingredient.name, ' ')"
+        )
+        schema_editor.execute(
+            f'UPDATE recipes_recipe AS recipe SET search_vector = '
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', recipe.name), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', "
+            f"coalesce({ingredient_names}, '')), 'B') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', recipe.text), 'C')"
+        )
+        schema_editor.execute(
+            'CREATE INDEX recipe_search_vector_idx '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {SQLITE_SEARCH_TABLE} '
+            f'USING fts5(name, ingredients, text, '
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        ingredient_names = INGREDIENT_NAMES.format(
+            aggregate="group_concat(ingredient.name, ' ')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO {SQLITE_SEARCH_TABLE} '
+            f'(rowid, name, ingredients, text) '
+            f'SELECT recipe.id, recipe.name, {ingredient_names}, recipe.text '
+            f'FROM recipes_recipe AS recipe'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX recipe_search_vector_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE {SQLITE_SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
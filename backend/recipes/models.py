@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
@@ -6,7 +7,7 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.validators import ASCIIUsernameValidator
 from transliterate import detect_language, slugify
 
-from core.models import NameModel
+from core.models import CountersModel, NameModel
 from core.constants import (
     USER_CHARFIELD_MAX_LENGTH, EMAILFIELD_MAX_LENGTH,
     CHARFIELD_MAX_LENGTH, SLUGFIELD_MAX_LENGTH,
@@ -14,7 +15,7 @@ from core.constants import (
 )
 
 
-class User(AbstractUser):
+class User(CountersModel, AbstractUser):
     """Модель пользователя."""
 
     username = models.CharField(
@@ -49,9 +50,20 @@ class User(AbstractUser):
         default=None,
         verbose_name='Аватар'
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
 
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ('email', 'first_name', 'last_name')
+    COUNTER_FIELDS = ('recipes_count', 'subscribers_count')
 
     class Meta:
         verbose_name = 'пользователь'
@@ -146,7 +158,18 @@ class Ingredient(NameModel):
         return self.name
 
 
-class Recipe(NameModel):
+class RecipeManager(models.Manager):
+    """Менеджер рецептов.
+
+    Поисковый вектор нужен только в запросах поиска и по умолчанию
+    не загружается.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+
+class Recipe(CountersModel, NameModel):
     """Модель рецептов."""
 
     author = models.ForeignKey(
@@ -163,6 +186,11 @@ class Recipe(NameModel):
         related_name='recipes',
         verbose_name='Теги'
     )
+    tags_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Битовая маска тегов'
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         through='IngredientRecipe',
@@ -173,6 +201,12 @@ class Recipe(NameModel):
         upload_to='recipes/images/',
         verbose_name='Изображение'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения'
+    )
     cooking_time = models.PositiveSmallIntegerField(
         validators=(
             MinValueValidator(
@@ -190,11 +224,38 @@ class Recipe(NameModel):
         auto_now_add=True,
         verbose_name='Дата и время публикации'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='У пользователей в избранном'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+
+    objects = RecipeManager()
+
+    COUNTER_FIELDS = ('favorites_count',)
 
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_favorites_count_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -301,3 +362,36 @@ class IngredientRecipe(models.Model):
 
     def __str__(self):
         return f'{self.ingredient} для {self.recipe}'
+
+
+class ShoppingCartIngredient(models.Model):
+    """Модель суммарного количества ингредиентов в корзине пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество'
+    )
+
+    class Meta:
+        verbose_name = 'ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзине'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_user_ingredient_in_cart'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient} в корзине {self.user}'
@@ -0,0 +1,214 @@
+"""Полнотекстовый поиск рецептов по названию, описанию и ингредиентам.
+
+В PostgreSQL поиск идет по столбцу search_vector с GIN индексом
+и русской морфологией, в SQLite (DEBUG) - по теневой таблице FTS5.
+Индекс обновляется сигналами и командой rebuild_search_index.
+"""
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector
+)
+from django.db import connection
+from django.db.models import (
+    Exists, F, FloatField, OuterRef, Q, Subquery, Value
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+
+from core.constants import (
+    SEARCH_CONFIG, SEARCH_WEIGHTS, SEARCH_INDEX_BATCH_SIZE,
+    SQLITE_SEARCH_TABLE, SQLITE_SEARCH_WEIGHTS
+)
+from .models import Ingredient, Recipe, IngredientRecipe
+
+
+class BaseRecipeSearch:
+    """Поиск без полнотекстового индекса: подстрока в названии,
+    описании или названии ингредиента, без ранжирования.
+    """
+
+    vendor = None
+
+    def refresh(self, recipes):
+        """Обновление индекса для рецептов из queryset."""
+        return 0
+
+    def clear(self):
+        """Очистка индекса перед полным перестроением."""
+
+    def remove(self, recipe_ids):
+        """Удаление рецептов из индекса."""
+
+    def search(self, queryset, query):
+        """Рецепты, подходящие под запрос, с аннотацией
+        search_rank, отсортированные по убыванию релевантности.
+        """
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+            | Exists(IngredientRecipe.objects.filter(
+                recipe=OuterRef('pk'), ingredient__name__icontains=query
+            ))
+        ).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        ).order_by('-pub_date', '-id')
+
+
+class PostgreSQLRecipeSearch(BaseRecipeSearch):
+    """Поиск по столбцу tsvector с GIN индексом."""
+
+    vendor = 'postgresql'
+
+    def refresh(self, recipes):
+        ingredient_names = Subquery(
+            IngredientRecipe.objects.filter(
+                recipe=OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                names=StringAgg('ingredient__name', ' ')
+            ).values('names')
+        )
+        name_weight, ingredients_weight, text_weight = SEARCH_WEIGHTS
+        return recipes.update(search_vector=(
+            SearchVector('name', weight=name_weight, config=SEARCH_CONFIG)
+            + SearchVector(
+                ingredient_names, weight=ingredients_weight,
+                config=SEARCH_CONFIG
+            )
+            + SearchVector('text', weight=text_weight, config=SEARCH_CONFIG)
+        ))
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        # ts_rank возвращает real, который при чтении округляется;
+        # double precision сохраняет значение для курсора страницы.
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=Cast(
+                SearchRank(F('search_vector'), search_query), FloatField()
+            )
+        ).order_by('-search_rank', '-id')
+
+
+class SQLiteRecipeSearch(BaseRecipeSearch):
+    """Поиск по теневой таблице FTS5, rowid которой равен id рецепта.
+
+    Морфология не поддерживается, поэтому слова запроса ищутся
+    как префиксы.
+    """
+
+    vendor = 'sqlite'
+
+    def refresh(self, recipes):
+        sql, params = recipes.values('pk').query.sql_with_params()
+        recipe_table = Recipe._meta.db_table
+        ingredient_recipe_table = IngredientRecipe._meta.db_table
+        ingredient_table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SQLITE_SEARCH_TABLE} WHERE rowid IN ({sql})',
+                params
+            )
+            cursor.execute(
+                f'INSERT INTO {SQLITE_SEARCH_TABLE} '
+                f'(rowid, name, ingredients, text) '
+                f'SELECT recipe.id, recipe.name, ('
+                f'SELECT group_concat(ingredient.name, \' \') '
+                f'FROM {ingredient_recipe_table} AS ingredient_recipe '
+                f'JOIN {ingredient_table} AS ingredient '
+                f'ON ingredient.id = ingredient_recipe.ingredient_id '
+                f'WHERE ingredient_recipe.recipe_id = recipe.id'
+                f'), recipe.text FROM {recipe_table} AS recipe '
+                f'WHERE recipe.id IN ({sql})',
+                params
+            )
+            return cursor.rowcount
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SQLITE_SEARCH_TABLE}')
+
+    def remove(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {SQLITE_SEARCH_TABLE} WHERE rowid IN '
+                f'({", ".join(["%s"] * len(recipe_ids))})',
+                recipe_ids
+            )
+
+    @staticmethod
+    def get_match_expression(query):
+        """Запрос FTS5: все слова запроса как префиксы в кавычках,
+        чтобы операторы FTS5 во вводе пользователя не применялись.
+        """
+        return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+
+    def search(self, queryset, query):
+        match = self.get_match_expression(query)
+        if not match:
+            return queryset.none()
+        weights = ', '.join(str(weight) for weight in SQLITE_SEARCH_WEIGHTS)
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {SQLITE_SEARCH_TABLE} '
+            f'WHERE {SQLITE_SEARCH_TABLE} MATCH %s', (match,)
+        )).annotate(search_rank=RawSQL(
+            # bm25 тем меньше, чем запись релевантнее.
+            f'SELECT -bm25({SQLITE_SEARCH_TABLE}, {weights}) '
+            f'FROM {SQLITE_SEARCH_TABLE} '
+            f'WHERE {SQLITE_SEARCH_TABLE} MATCH %s '
+            f'AND rowid = {Recipe._meta.db_table}.id',
+            (match,), output_field=FloatField()
+        )).order_by('-search_rank', '-id')
+
+
+SEARCH_BACKENDS = {
+    backend.vendor: backend for backend in (
+        PostgreSQLRecipeSearch,
+        SQLiteRecipeSearch
+    )
+}
+
+
+def get_search_backend():
+    """Поиск для текущей базы данных."""
+    return SEARCH_BACKENDS.get(connection.vendor, BaseRecipeSearch)()
+
+
+def search_recipes(queryset, query):
+    """Полнотекстовый поиск рецептов с ранжированием."""
+    return get_search_backend().search(queryset, query)
+
+
+def refresh_search_index(recipes):
+    """Обновление поискового индекса рецептов из queryset.
+
+    Нужно после изменения названия, описания или ингредиентов
+    рецепта, в том числе после вставки связей через bulk_create.
+    """
+    return get_search_backend().refresh(recipes)
+
+
+def rebuild_search_index(batch_size=SEARCH_INDEX_BATCH_SIZE):
+    """Полное перестроение поискового индекса пакетами
+    рецептов по диапазонам id.
+    """
+    backend = get_search_backend()
+    backend.clear()
+    refreshed = 0
+    last_id = Recipe.objects.order_by('-id').values_list(
+        'id', flat=True
+    ).first() or 0
+    for start in range(0, last_id + 1, batch_size):
+        refreshed += backend.refresh(Recipe.objects.filter(
+            id__gte=start, id__lt=start + batch_size
+        ))
+    return refreshed
+
+
+def remove_from_search_index(recipe_ids):
+    """Удаление рецептов из поискового индекса."""
+    get_search_backend().remove(recipe_ids)
@@ -0,0 +1,329 @@
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .models import (
+    User, Ingredient, Tag, Recipe, IngredientRecipe, Subscription,
+    FavoriteRecipe, ShoppingCart
+)
+from .search import refresh_search_index, remove_from_search_index
+from .utils import (
+    COUNTERS, COUNTERS_RECOMPUTATION, SHOPPING_CART_RECOMPUTATION,
+    bump_model_version, bump_object_version, change_counter,
+    delete_image_variants, get_cart_changes, get_tags_mask,
+    is_recomputed_explicitly, refresh_shopping_cart_ingredients
+)
+
+# Поля рецепта, которые входят в поисковый индекс.
+SEARCH_FIELDS = {'name', 'text'}
+
+# Корзины, зависящие от удаляемых объектов, от pre_delete
+# до post_delete: id(origin) -> (origin, пользователи, ингредиенты).
+# origin хранится в записи, чтобы его id не занял другой объект.
+deleted_cart_changes = ContextVar('deleted_cart_changes', default=None)
+
+
+def get_origin_model(origin):
+    """Модель объекта или queryset, удаление которого вызвало
+    каскадное удаление.
+    """
+    return origin.model if isinstance(origin, QuerySet) else type(origin)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def bump_version(sender, **kwargs):
+    """Обновление версии данных при изменении объектов."""
+    bump_model_version(sender)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def bump_recipes_version(sender, created=True, **kwargs):
+    """Обновление версии данных рецептов при создании и удалении.
+
+    От нее зависит только набор id рецептов коротких ссылок,
+    поэтому изменение рецепта версию не меняет.
+    """
+    if created:
+        bump_model_version(sender)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=User)
+def bump_instance_version(sender, instance, update_fields=None, **kwargs):
+    """Обновление версии рецепта или автора для сброса кэша
+    представлений рецептов и кэша токенов пользователя.
+    """
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_object_version(sender, instance.pk)
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def bump_recipe_version(instance, **kwargs):
+    """Обновление версии рецепта при изменении его ингредиентов."""
+    bump_object_version(Recipe, instance.recipe_id)
+
+
+@receiver(post_delete, sender=Token)
+def bump_token_version(sender, instance, **kwargs):
+    """Сброс кэша удаленного токена при выходе пользователя.
+
+    Смена пароля и деактивация сбрасывают кэш токенов пользователя
+    через версию пользователя (bump_instance_version).
+    """
+    bump_object_version(sender, instance.pk)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_tags_mask(instance, action, reverse, pk_set, **kwargs):
+    """Обновление битовой маски тегов рецептов при изменении
+    связей с тегами.
+
+    Если маска рецепта в памяти уже учитывает изменение (ее
+    сохранили заранее), запрос не выполняется. Иначе она меняется
+    запросом UPDATE с F() и вручную в памяти, чтобы save() рецепта
+    не вернул старое значение.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        recipes = Recipe.objects.all()
+        if pk_set is not None:
+            recipes = recipes.filter(pk__in=pk_set)
+        bits = get_tags_mask((instance.pk,))
+    else:
+        recipes = Recipe.objects.filter(pk=instance.pk)
+        bits = ~0 if pk_set is None else get_tags_mask(pk_set)
+        if action == 'post_add':
+            bits &= ~instance.tags_mask
+            instance.tags_mask |= bits
+        else:
+            bits &= instance.tags_mask
+            instance.tags_mask &= ~bits
+    if not bits:
+        return
+    if action == 'post_add':
+        recipes.update(tags_mask=F('tags_mask').bitor(bits))
+    else:
+        recipes.update(tags_mask=F('tags_mask').bitand(~bits))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipe_tags_version(instance, action, reverse, **kwargs):
+    """Сброс кэша представлений рецептов при изменении их тегов."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        bump_model_version(Tag)
+    else:
+        bump_object_version(Recipe, instance.pk)
+
+
+@receiver(post_delete, sender=Tag)
+def clear_tag_bit(instance, **kwargs):
+    """Удаление бита тега из масок рецептов: связи с тегом
+    удаляются каскадно без сигнала m2m_changed.
+    """
+    bits = get_tags_mask((instance.pk,))
+    if bits:
+        Recipe.objects.filter(
+            tags_mask=F('tags_mask').bitor(bits)
+        ).update(tags_mask=F('tags_mask').bitand(~bits))
+
+
+def change_related_counters(instance, delta):
+    """Изменение счетчиков, которые учитывают объект."""
+    for model, counter, related_model, field in COUNTERS:
+        if isinstance(instance, related_model):
+            change_counter(
+                model.objects.filter(pk=getattr(instance, f'{field}_id')),
+                counter, delta
+            )
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Subscription)
+@receiver(post_save, sender=FavoriteRecipe)
+def increment_counters(instance, created, **kwargs):
+    """Увеличение счетчиков рецептов автора, подписчиков
+    и избранного рецепта.
+    """
+    if created:
+        change_related_counters(instance, 1)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_delete, sender=FavoriteRecipe)
+def decrement_counters(instance, origin=None, **kwargs):
+    """Уменьшение счетчиков при удалении объекта.
+
+    При каскадном удалении вместе с рецептом или пользователем
+    счетчики либо удаляются вместе с ними, либо уменьшаются
+    одним запросом в decrement_user_counters. При удалении связей
+    в delete_links счетчики уже уменьшены.
+    """
+    if is_recomputed_explicitly(COUNTERS_RECOMPUTATION):
+        return
+    origin_model = get_origin_model(origin)
+    if issubclass(origin_model, (User, Recipe)) and not isinstance(
+        instance, origin_model
+    ):
+        return
+    change_related_counters(instance, -1)
+
+
+@receiver(pre_delete, sender=User)
+def decrement_user_counters(instance, **kwargs):
+    """Уменьшение счетчиков избранного рецептов и подписчиков
+    авторов, связанных с удаляемым пользователем.
+    """
+    change_counter(
+        Recipe.objects.filter(recipes_in_favorite__user=instance),
+        'favorites_count', -1
+    )
+    change_counter(
+        User.objects.filter(subscribing__user=instance),
+        'subscribers_count', -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_index(instance, created, update_fields=None,
+                               **kwargs):
+    """Обновление поискового индекса при изменении названия
+    или описания рецепта.
+    """
+    if created or update_fields is None or SEARCH_FIELDS & set(update_fields):
+        refresh_search_index(Recipe.objects.filter(pk=instance.pk))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_search_index(instance, **kwargs):
+    """Удаление рецепта из поискового индекса."""
+    remove_from_search_index((instance.pk,))
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_recipe_image_variants(instance, **kwargs):
+    """Удаление уменьшенных копий изображения рецепта после
+    фиксации транзакции.
+    """
+    variants = instance.image_variants
+    if variants:
+        transaction.on_commit(lambda: delete_image_variants(variants))
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def update_ingredients_search_index(signal, instance, origin=None,
+                                    **kwargs):
+    """Обновление поискового индекса при изменении ингредиентов
+    рецепта. После удаления queryset или каскадного удаления индекс
+    обновляется один раз: в create_update_recipe или сигналами
+    рецепта и ингредиента.
+    """
+    if signal is post_delete and not isinstance(origin, IngredientRecipe):
+        return
+    refresh_search_index(Recipe.objects.filter(pk=instance.recipe_id))
+
+
+@receiver(post_save, sender=Ingredient)
+def update_ingredient_search_index(instance, created, update_fields=None,
+                                   **kwargs):
+    """Обновление поискового индекса рецептов при переименовании
+    ингредиента.
+    """
+    if not created and (update_fields is None or 'name' in update_fields):
+        refresh_search_index(
+            Recipe.objects.filter(recipe_ingredients__ingredient=instance)
+        )
+
+
+@receiver(pre_delete, sender=Ingredient)
+def collect_ingredient_recipes(instance, **kwargs):
+    """Запоминание рецептов удаляемого ингредиента до удаления
+    связей с ними.
+    """
+    instance.search_recipe_ids = list(
+        instance.ingredient_recipes.values_list('recipe_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Ingredient)
+def update_deleted_ingredient_search_index(instance, **kwargs):
+    """Обновление поискового индекса рецептов удаленного ингредиента."""
+    recipe_ids = getattr(instance, 'search_recipe_ids', None)
+    if recipe_ids:
+        refresh_search_index(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+@receiver(pre_save, sender=ShoppingCart)
+@receiver(pre_save, sender=IngredientRecipe)
+def collect_saved_cart_changes(sender, instance, raw=False, **kwargs):
+    """Запоминание корзин, которые зависели от изменяемой связи
+    до ее сохранения: у нее мог смениться рецепт или ингредиент.
+    """
+    if not raw and not instance._state.adding:
+        instance.saved_cart_changes = get_cart_changes(sender, instance)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=IngredientRecipe)
+def refresh_saved_cart_totals(sender, instance, raw=False, **kwargs):
+    """Пересчет корзин при добавлении рецепта в корзину
+    и при изменении ингредиентов рецепта.
+    """
+    if raw:
+        return
+    users, ingredients = get_cart_changes(sender, instance)
+    old_users, old_ingredients = getattr(
+        instance, 'saved_cart_changes', (set(), set())
+    )
+    refresh_shopping_cart_ingredients(
+        users | old_users, ingredients | old_ingredients
+    )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+@receiver(pre_delete, sender=IngredientRecipe)
+@receiver(pre_delete, sender=Recipe)
+@receiver(pre_delete, sender=User)
+def collect_deleted_cart_changes(sender, origin=None, **kwargs):
+    """Запоминание корзин, которые зависят от удаляемых объектов.
+
+    Корзины определяются один раз для объекта или queryset, удаление
+    которого начато, пока связи еще есть в БД. Каскадно удаляемые
+    связи учитываются вместе с ним.
+    """
+    if (
+        get_origin_model(origin) is not sender
+        or is_recomputed_explicitly(SHOPPING_CART_RECOMPUTATION)
+    ):
+        return
+    pending = deleted_cart_changes.get()
+    if pending is None:
+        pending = {}
+        deleted_cart_changes.set(pending)
+    if id(origin) not in pending:
+        pending[id(origin)] = (origin, *get_cart_changes(sender, origin))
+
+
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=IngredientRecipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def refresh_deleted_cart_totals(sender, origin=None, **kwargs):
+    """Пересчет корзин один раз после удаления объекта или queryset."""
+    if get_origin_model(origin) is not sender:
+        return
+    pending = deleted_cart_changes.get()
+    if pending and id(origin) in pending:
+        _, users, ingredients = pending.pop(id(origin))
+        refresh_shopping_cart_ingredients(users, ingredients)
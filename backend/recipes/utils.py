@@ -0,0 +1,315 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import (
+    BigIntegerField, Count, ExpressionWrapper, F, IntegerField, OuterRef,
+    QuerySet, Subquery, Sum, Value
+)
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+from core.constants import TAGS_MASK_BITS
+from .models import (
+    User, Recipe, Subscription, IngredientRecipe, FavoriteRecipe,
+    ShoppingCart, ShoppingCartIngredient
+)
+
+# Счетчик, модель связей, по которым он считается, и поле связи.
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'subscribers_count', Subscription, 'author'),
+)
+
+# Пересчеты, которые сигналы удаления пропускают, потому что их
+# выполняет вызывающий код (см. recomputed_explicitly).
+COUNTERS_RECOMPUTATION = 'counters'
+SHOPPING_CART_RECOMPUTATION = 'shopping_cart'
+explicit_recomputations = ContextVar(
+    'explicit_recomputations', default=frozenset()
+)
+
+
+@contextmanager
+def recomputed_explicitly(*recomputations):
+    """Удаление объектов без пересчетов recomputations
+    в сигналах: вызывающий код выполняет их сам.
+    """
+    token = explicit_recomputations.set(
+        explicit_recomputations.get() | set(recomputations)
+    )
+    try:
+        yield
+    finally:
+        explicit_recomputations.reset(token)
+
+
+def is_recomputed_explicitly(recomputation):
+    """Выполняет ли пересчет вызывающий код (recomputed_explicitly)."""
+    return recomputation in explicit_recomputations.get()
+
+
+def get_shopping_cart_totals(**filters):
+    """Подсчет количества ингредиентов в корзинах пользователей."""
+    return IngredientRecipe.objects.filter(
+        recipe__recipes_in_cart__isnull=False, **filters
+    ).values(
+        'ingredient', user=F('recipe__recipes_in_cart__user')
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by()
+
+
+@transaction.atomic
+def refresh_shopping_cart_ingredients(users, ingredients):
+    """Пересчет ингредиентов в корзинах указанных пользователей.
+
+    Пересчитываются только пары (пользователь, ингредиент),
+    затронутые изменением корзины или рецепта.
+    """
+    users = list(users)
+    ingredients = list(ingredients)
+    if not users or not ingredients:
+        return
+    totals = {
+        (item['user'], item['ingredient']): item['total_amount']
+        for item in get_shopping_cart_totals(
+            recipe__recipes_in_cart__user__in=users,
+            ingredient__in=ingredients
+        )
+    }
+    stale = [
+        pk for pk, user_id, ingredient_id in (
+            ShoppingCartIngredient.objects.filter(
+                user__in=users, ingredient__in=ingredients
+            ).values_list('pk', 'user_id', 'ingredient_id')
+        ) if (user_id, ingredient_id) not in totals
+    ]
+    if stale:
+        ShoppingCartIngredient.objects.filter(pk__in=stale).delete()
+    ShoppingCartIngredient.objects.bulk_create(
+        (
+            ShoppingCartIngredient(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total_amount
+            ) for (user_id, ingredient_id), total_amount in totals.items()
+        ),
+        update_conflicts=True,
+        unique_fields=('user', 'ingredient'),
+        update_fields=('total_amount',)
+    )
+
+
+def get_cart_changes(model, objects):
+    """Пользователи и ингредиенты, суммы которых в корзинах зависят
+    от объекта или queryset objects модели model.
+
+    Вызывается до удаления или изменения объектов, пока связи
+    с корзинами и рецептами еще есть в БД.
+    """
+    ids = (
+        objects.values('pk') if isinstance(objects, QuerySet)
+        else (objects.pk,)
+    )
+    if model is ShoppingCart:
+        carts = ShoppingCart.objects.filter(pk__in=ids)
+        ingredients = IngredientRecipe.objects.filter(
+            recipe__recipes_in_cart__in=ids
+        )
+    elif model is IngredientRecipe:
+        carts = ShoppingCart.objects.filter(
+            recipe__recipe_ingredients__in=ids
+        )
+        ingredients = IngredientRecipe.objects.filter(pk__in=ids)
+    else:
+        recipes = Recipe.objects.filter(
+            **{'pk__in' if model is Recipe else 'author__in': ids}
+        )
+        carts = ShoppingCart.objects.filter(recipe__in=recipes)
+        ingredients = IngredientRecipe.objects.filter(recipe__in=recipes)
+    return (
+        set(carts.values_list('user_id', flat=True)),
+        set(ingredients.values_list('ingredient_id', flat=True))
+    )
+
+
+def get_recipes_ingredient_ids(recipe_ids):
+    """Получение id ингредиентов нескольких рецептов."""
+    return IngredientRecipe.objects.filter(
+        recipe__in=recipe_ids
+    ).values_list('ingredient_id', flat=True).distinct()
+
+
+def get_recipe_cart_user_ids(recipe):
+    """Получение id пользователей, у которых рецепт в корзине."""
+    return recipe.recipes_in_cart.values_list('user_id', flat=True)
+
+
+def get_tags_mask(tag_ids):
+    """Битовая маска тегов: бит с номером id для каждого тега.
+
+    Теги с id не меньше TAGS_MASK_BITS в маску не входят,
+    рецепты с ними фильтруются подзапросом.
+    """
+    mask = 0
+    for tag_id in tag_ids:
+        if tag_id < TAGS_MASK_BITS:
+            mask |= 1 << tag_id
+    return mask
+
+
+def refresh_recipe_tags_masks(recipes=None):
+    """Пересчет масок тегов рецептов одним запросом UPDATE.
+
+    Нужен после вставки связей рецептов с тегами в обход
+    сигнала m2m_changed. Биты тегов не пересекаются, поэтому
+    сумма битов равна их объединению.
+    """
+    if recipes is None:
+        recipes = Recipe.objects.all()
+    RecipeTag = Recipe.tags.through
+    tag_bit = ExpressionWrapper(
+        Cast(Value(1), BigIntegerField()).bitleftshift(
+            Cast('tag_id', IntegerField())
+        ),
+        output_field=BigIntegerField()
+    )
+    return recipes.update(tags_mask=Coalesce(
+        Subquery(
+            RecipeTag.objects.filter(
+                recipe=OuterRef('pk'), tag_id__lt=TAGS_MASK_BITS
+            ).values('recipe').annotate(mask=Sum(tag_bit)).values('mask'),
+            output_field=BigIntegerField()
+        ),
+        0
+    ))
+
+
+def change_counter(queryset, field, delta):
+    """Атомарное изменение счетчика запросом UPDATE с F()."""
+    return queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def change_links_counters(related_model, ids, delta):
+    """Изменение счетчиков объектов с указанными id, которые
+    учитывают связи related_model, одним запросом на счетчик.
+
+    Каждый объект должен входить в изменение не больше одного раза.
+    """
+    for model, counter, counted_model, _ in COUNTERS:
+        if counted_model is related_model:
+            change_counter(model.objects.filter(pk__in=ids), counter, delta)
+
+
+@transaction.atomic
+def delete_links(queryset, field, ids):
+    """Удаление связей queryset с объектами field из ids.
+
+    Счетчики объектов уменьшаются одним запросом, а не сигналом
+    post_delete каждой связи.
+    """
+    change_links_counters(queryset.model, ids, -1)
+    with recomputed_explicitly(COUNTERS_RECOMPUTATION):
+        return queryset.filter(**{f'{field}__in': ids}).delete()
+
+
+def get_actual_count(related_model, field):
+    """Подзапрос с фактическим количеством связанных объектов."""
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0
+    )
+
+
+def reconcile_counters(check=False):
+    """Сверка счетчиков с фактическим количеством связей.
+
+    Возвращает количество расходящихся значений каждого счетчика.
+    """
+    drift = {}
+    for model, counter, related_model, field in COUNTERS:
+        actual = get_actual_count(related_model, field)
+        stale = model.objects.exclude(**{counter: actual})
+        drift[f'{model.__name__}.{counter}'] = (
+            stale.count() if check else stale.update(**{counter: actual})
+        )
+    return drift
+
+
+def get_model_version_key(model):
+    """Получение ключа кэша с версией данных модели."""
+    return f'version:{model._meta.label_lower}'
+
+
+def get_model_version(model):
+    """Получение версии данных модели.
+
+    Версия - время последнего изменения в наносекундах. Если ключ
+    вытеснен из кэша, создается новая версия, и все зависимые
+    кэши перестраиваются.
+    """
+    return cache.get_or_set(
+        get_model_version_key(model), time.time_ns, timeout=None
+    )
+
+
+def bump_cache_version(key):
+    """Обновление версии после фиксации транзакции.
+
+    Если обновить версию раньше, параллельный запрос может прочитать
+    еще не измененные данные и сохранить их в кэш под новой версией.
+    Вне транзакции версия обновляется сразу.
+    """
+    transaction.on_commit(
+        lambda: cache.set(key, time.time_ns(), timeout=None)
+    )
+
+
+def bump_model_version(model):
+    """Обновление версии данных модели."""
+    bump_cache_version(get_model_version_key(model))
+
+
+def get_object_version_key(model, pk):
+    """Получение ключа кэша с версией данных объекта."""
+    return f'version:{model._meta.label_lower}:{pk}'
+
+
+def get_object_versions(objects):
+    """Получение версий данных объектов одним запросом к кэшу.
+
+    objects - пары (модель, pk). Отсутствующие в кэше версии
+    создаются так же, как в get_model_version.
+    """
+    keys = {
+        (model, pk): get_object_version_key(model, pk)
+        for model, pk in objects
+    }
+    versions = cache.get_many(keys.values())
+    for key in keys.values():
+        if key not in versions:
+            versions[key] = cache.get_or_set(
+                key, time.time_ns, timeout=None
+            )
+    return {obj: versions[key] for obj, key in keys.items()}
+
+
+def bump_object_version(model, pk):
+    """Обновление версии данных объекта."""
+    bump_cache_version(get_object_version_key(model, pk))
+
+
+def delete_image_variants(variants):
+    """Удаление уменьшенных копий изображения из хранилища."""
+    for name in variants.values():
+        default_storage.delete(name)
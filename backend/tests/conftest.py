@@ -0,0 +1,231 @@
+import os
+import traceback
+from itertools import count
+
+import pytest
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import connection
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    User, Recipe, Ingredient, Tag, IngredientRecipe,
+    Subscription, FavoriteRecipe, ShoppingCart
+)
+from recipes.search import rebuild_search_index
+from recipes.utils import (
+    reconcile_counters, refresh_shopping_cart_ingredients
+)
+
+PASSWORD = 'Test-password-123'
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAA'
+    'C0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII='
+)
+# Объемы данных, на которых сравнивается количество SQL запросов.
+SIZES = (1, 3)
+TESTS_DIR = os.path.dirname(__file__)
+PROJECT_DIR = str(django_settings.BASE_DIR)
+
+
+def format_frame(frame, base_dir):
+    return (
+        f'{os.path.relpath(frame.filename, base_dir)}:{frame.lineno} '
+        f'in {frame.name}'
+    )
+
+
+class QueryLog:
+    """Запись SQL запросов вместе с местом вызова в коде проекта."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((self.get_call_site(), sql))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    @staticmethod
+    def get_call_site():
+        """Ближайшее к запросу место вызова в коде проекта,
+        а если его нет - в коде сторонней библиотеки.
+        """
+        library_frame = None
+        for frame in reversed(traceback.extract_stack()[:-3]):
+            path = frame.filename
+            if path.startswith(TESTS_DIR) or path.endswith('middleware.py'):
+                continue
+            if path.startswith(PROJECT_DIR):
+                return format_frame(frame, PROJECT_DIR)
+            if library_frame is None and f'django{os.sep}db' not in path:
+                library_frame = frame
+        return library_frame and format_frame(
+            library_frame, os.path.dirname(os.__file__)
+        )
+
+    def report(self):
+        """SQL запросы, сгруппированные по месту вызова."""
+        groups = {}
+        for call_site, sql in self.queries:
+            groups.setdefault(call_site, []).append(sql)
+        lines = []
+        for call_site, queries in groups.items():
+            lines.append(f'{call_site}: {len(queries)}')
+            lines.extend(f'    {sql}' for sql in dict.fromkeys(queries))
+        return '\n'.join(lines)
+
+
+def measure(request, clear_cache=True):
+    """Выполнение запроса с записью SQL запросов. Кэш очищается
+    заранее, чтобы каждый замер начинался с одинакового состояния.
+    """
+    if clear_cache:
+        cache.clear()
+    log = QueryLog()
+    with connection.execute_wrapper(log):
+        response = request()
+        # Потоковые ответы выполняют запросы при чтении содержимого.
+        response.getvalue()
+    return response, log
+
+
+def check_query_count(name, dataset, get_request, expected_status, budget):
+    """Проверка, что количество SQL запросов не зависит от объема
+    данных и не превышает бюджет.
+
+    get_request вызывается после каждого увеличения набора данных
+    и возвращает замеряемый запрос.
+    """
+    logs = []
+    for size in SIZES:
+        dataset.grow(size)
+        response, log = measure(get_request())
+        assert response.status_code == expected_status, (
+            f'{name}: ответ {response.status_code}, '
+            f'ожидался {expected_status}'
+        )
+        logs.append(log)
+    small, large = logs
+    assert len(small) == len(large), (
+        f'{name}: количество SQL запросов зависит от объема данных '
+        f'({len(small)} -> {len(large)})\n{large.report()}'
+    )
+    assert len(large) <= budget, (
+        f'{name}: {len(large)} SQL запросов при бюджете {budget}\n'
+        f'{large.report()}'
+    )
+
+
+class Dataset:
+    """Набор данных, который можно увеличивать между замерами."""
+
+    def __init__(self, user):
+        self.user = user
+        self.numbers = count(1)
+        self.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+            for number in range(20)
+        )
+        self.tags = Tag.objects.bulk_create(
+            Tag(name=f'Тег {number}', slug=f'tag-{number}')
+            for number in range(5)
+        )
+        self.authors = []
+        self.recipes = []
+        self.size = 0
+
+    def create_user(self, password=None, **fields):
+        number = next(self.numbers)
+        user = User(
+            username=f'user-{number}', email=f'user-{number}@example.com',
+            first_name='Имя', last_name='Фамилия', **fields
+        )
+        user.set_password(password)
+        user.save()
+        return user
+
+    def create_recipe(self, author):
+        number = next(self.numbers)
+        recipe = Recipe.objects.create(
+            author=author, name=f'Рецепт {number}', text='Описание',
+            image='recipes/images/test.png', cooking_time=10
+        )
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=10)
+            for ingredient in self.ingredients[:self.size + 2]
+        )
+        recipe.tags.set(self.tags[:self.size])
+        return recipe
+
+    def create_author(self):
+        author = self.create_user()
+        for _ in range(self.size + 1):
+            self.recipes.append(self.create_recipe(author))
+        return author
+
+    def grow(self, size):
+        """Добавление авторов, рецептов, подписок, избранного
+        и корзины пользователя. Количество объектов растет вместе
+        с size.
+        """
+        self.size = size
+        first_recipe = len(self.recipes)
+        for _ in range(size):
+            self.authors.append(self.create_author())
+        new_recipes = self.recipes[first_recipe:]
+        Subscription.objects.bulk_create(
+            Subscription(user=self.user, author=author)
+            for author in self.authors[-size:]
+        )
+        FavoriteRecipe.objects.bulk_create(
+            FavoriteRecipe(user=self.user, recipe=recipe)
+            for recipe in new_recipes
+        )
+        ShoppingCart.objects.bulk_create(
+            ShoppingCart(user=self.user, recipe=recipe)
+            for recipe in new_recipes
+        )
+        refresh_shopping_cart_ingredients(
+            (self.user.id,), (ingredient.id for ingredient in self.ingredients)
+        )
+        reconcile_counters()
+        rebuild_search_index()
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(settings, tmp_path):
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': str(tmp_path),
+        }
+    }
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(
+        username='test-user', email='test-user@example.com',
+        first_name='Имя', last_name='Фамилия', password=PASSWORD
+    )
+
+
+@pytest.fixture
+def dataset(user):
+    return Dataset(user)
+
+
+@pytest.fixture
+def client():
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
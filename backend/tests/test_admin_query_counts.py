@@ -0,0 +1,44 @@
+"""Количество SQL запросов страниц админки не должно зависеть
+от объема данных и превышать бюджет страницы.
+"""
+import pytest
+from django.test import Client
+
+from .conftest import check_query_count
+
+# Страница админки и бюджет SQL запросов.
+PAGES = {
+    'recipe-changelist': (lambda dataset: '/admin/recipes/recipe/', 5),
+    'recipe-change': (
+        lambda dataset: f'/admin/recipes/recipe/{dataset.recipes[0].id}/'
+        'change/', 12
+    ),
+    'user-changelist': (lambda dataset: '/admin/recipes/user/', 5),
+    'subscription-changelist': (
+        lambda dataset: '/admin/recipes/subscription/', 4
+    ),
+    'favorite-changelist': (
+        lambda dataset: '/admin/recipes/favoriterecipe/', 4
+    ),
+    'shopping-cart-changelist': (
+        lambda dataset: '/admin/recipes/shoppingcart/', 4
+    ),
+    'ingredient-changelist': (lambda dataset: '/admin/recipes/ingredient/', 5),
+    'tag-changelist': (lambda dataset: '/admin/recipes/tag/', 5),
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', PAGES)
+def test_admin_query_count(name, dataset):
+    get_url, budget = PAGES[name]
+    client = Client()
+    client.force_login(dataset.create_user(is_staff=True, is_superuser=True))
+
+    def get_request():
+        url = get_url(dataset)
+        # Прогрев кэшей процесса, например ContentType.
+        client.get(url)
+        return lambda: client.get(url)
+
+    check_query_count(name, dataset, get_request, 200, budget)
@@ -0,0 +1,136 @@
+from itertools import product
+from urllib.parse import urlencode
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client
+from rest_framework.authtoken.models import Token
+
+from api.short_links import encode_short_code
+from recipes.models import Recipe
+
+JSON = {'Accept': 'application/json'}
+
+
+def recipe_urls(dataset):
+    recipe = dataset.recipes[0]
+    tag = dataset.tags[0]
+    return (
+        '/api/recipes/',
+        '/api/recipes/?limit=2&page=2',
+        '/api/recipes/?page=100',
+        '/api/recipes/?cursor=&limit=2&count=true',
+        f'/api/recipes/?is_favorited=1&tags={tag.slug}',
+        '/api/recipes/?' + urlencode(
+            {'search': 'рецепт', 'ordering': '-favorites_count'}
+        ),
+        '/api/recipes/?author=author',
+        f'/api/recipes/{recipe.id}/',
+        '/api/recipes/100000/',
+        '/api/tags/',
+        f'/api/tags/{tag.id}/',
+        '/api/ingredients/?' + urlencode({'name': 'ингр'}),
+        f'/api/ingredients/{dataset.ingredients[0].id}/',
+        f'/s/{encode_short_code(recipe.id)}/',
+    )
+
+
+def async_get(url, headers):
+    return async_to_sync(AsyncClient().get)(url, headers=headers)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('authenticated', (False, True))
+def test_async_views_match_sync_views(authenticated, dataset):
+    dataset.grow(3)
+    headers = JSON
+    if authenticated:
+        token = Token.objects.create(user=dataset.user)
+        headers = {**JSON, 'Authorization': f'Token {token.key}'}
+    for url in recipe_urls(dataset):
+        expected = Client().get(url, headers=headers)
+        response = async_get(url, headers)
+        assert response.resolver_match.func.__module__ == 'api.async_views', (
+            f'{url}: запрос обработан синхронным представлением'
+        )
+        assert (response.status_code, response.content) == (
+            expected.status_code, expected.content
+        ), url
+
+
+def filter_matrix(dataset):
+    """Все сочетания параметров фильтрации и сортировки списка."""
+    tags = [tag.slug for tag in dataset.tags[:2]]
+    options = {
+        'is_favorited': (None, 1, 0),
+        'is_in_shopping_cart': (None, 1),
+        'tags': (None, tags[:1], tags),
+        'tags_match': (None, 'all'),
+        'author': (None, dataset.authors[0].id),
+        'search': (None, 'рецепт'),
+        'ordering': (None, '-favorites_count'),
+    }
+    for values in product(*options.values()):
+        yield '/api/recipes/?' + urlencode({
+            name: value for name, value in zip(options, values)
+            if value is not None
+        }, doseq=True)
+
+
+@pytest.mark.django_db
+def test_async_recipe_list_matches_filter_matrix(dataset):
+    dataset.grow(2)
+    token = Token.objects.create(user=dataset.user)
+    headers = {**JSON, 'Authorization': f'Token {token.key}'}
+    for url in filter_matrix(dataset):
+        expected = Client().get(url, headers=headers)
+        response = async_get(url, headers)
+        assert (response.status_code, response.content) == (
+            expected.status_code, expected.content
+        ), url
+
+
+@pytest.mark.django_db
+def test_async_views_reject_invalid_token(dataset):
+    response = async_get('/api/recipes/', {**JSON, 'Authorization': 'Token -'})
+    assert response.status_code == 401
+    assert response['WWW-Authenticate'] == 'Token'
+
+
+@pytest.mark.django_db
+def test_async_routes_pass_writes_to_sync_views(dataset):
+    dataset.grow(1)
+    recipe = dataset.recipes[0]
+    token = Token.objects.create(user=recipe.author)
+    response = async_to_sync(AsyncClient().delete)(
+        f'/api/recipes/{recipe.id}/',
+        headers={'Authorization': f'Token {token.key}'}
+    )
+    assert response.status_code == 204
+    assert not Recipe.objects.filter(pk=recipe.pk).exists()
+
+
+@pytest.mark.django_db
+def test_async_reference_views_return_not_modified(dataset):
+    response = async_get('/api/tags/', JSON)
+    assert response.status_code == 200
+    response = async_get(
+        '/api/tags/', {**JSON, 'If-None-Match': response['ETag']}
+    )
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('get', (
+    lambda url, headers: Client().get(url, headers=headers), async_get
+))
+def test_cached_reference_views_reject_invalid_token(get, dataset):
+    response = get('/api/tags/', JSON)
+    assert response.status_code == 200
+    for headers in (
+        {**JSON, 'Authorization': 'Token -'},
+        {**JSON, 'Authorization': 'Token -', 'If-None-Match': response['ETag']}
+    ):
+        response = get('/api/tags/', headers)
+        assert response.status_code == 401
+        assert response['WWW-Authenticate'] == 'Token'
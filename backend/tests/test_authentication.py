@@ -0,0 +1,86 @@
+import pytest
+from django.db.models import F
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.authentication import CachedTokenAuthentication, token_cache
+from recipes.models import User
+
+
+def token_client(key):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {key}')
+    return client
+
+
+def create_key(user):
+    return Token.objects.create(user=user).key
+
+
+@pytest.mark.django_db
+def test_logout_evicts_only_its_token(
+    dataset, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    keys = [create_key(dataset.create_user()) for _ in range(2)]
+    first, second = map(token_client, keys)
+    for client in (first, second):
+        assert client.get('/api/users/me/').status_code == 200
+    with django_capture_on_commit_callbacks(execute=True):
+        assert first.post('/api/auth/token/logout/').status_code == 204
+    assert first.get('/api/users/me/').status_code == 401
+    hits = token_cache.stats()['hits']
+    with django_assert_num_queries(0):
+        CachedTokenAuthentication().authenticate_credentials(keys[1])
+    assert token_cache.stats()['hits'] == hits + 1
+
+
+@pytest.mark.django_db
+def test_deactivated_user_is_rejected(
+    dataset, django_capture_on_commit_callbacks
+):
+    user = dataset.create_user()
+    client = token_client(create_key(user))
+    assert client.get('/api/users/me/').status_code == 200
+    user.is_active = False
+    with django_capture_on_commit_callbacks(execute=True):
+        user.save()
+    assert client.get('/api/users/me/').status_code == 401
+
+
+@pytest.mark.django_db
+def test_cached_user_save_keeps_counters(dataset):
+    user = dataset.create_user()
+    key = create_key(user)
+    authentication = CachedTokenAuthentication()
+    authentication.authenticate_credentials(key)
+    User.objects.filter(pk=user.pk).update(
+        subscribers_count=F('subscribers_count') + 1
+    )
+    cached_user, _ = authentication.authenticate_credentials(key)
+    cached_user.first_name = 'Другое имя'
+    cached_user.save()
+    user.refresh_from_db()
+    assert (user.first_name, user.subscribers_count) == ('Другое имя', 1)
+
+
+@pytest.mark.django_db
+def test_user_change_during_load_is_not_cached(
+    dataset, monkeypatch, django_capture_on_commit_callbacks
+):
+    user = dataset.create_user()
+    key = create_key(user)
+    load_credentials = CachedTokenAuthentication.load_credentials
+
+    def load_then_change(self, key):
+        credentials = load_credentials(self, key)
+        # Пользователь изменен после загрузки, но до записи в кэш.
+        with django_capture_on_commit_callbacks(execute=True):
+            User.objects.get(pk=user.pk).save()
+        return credentials
+
+    monkeypatch.setattr(
+        CachedTokenAuthentication, 'load_credentials', load_then_change
+    )
+    CachedTokenAuthentication().authenticate_credentials(key)
+    monkeypatch.undo()
+    assert token_cache.get(key) is None
@@ -0,0 +1,8 @@
+import pytest
+from django.core.management import CommandError, call_command
+
+
+def test_benchmark_refuses_to_run_without_debug(settings):
+    settings.DEBUG = False
+    with pytest.raises(CommandError, match='--allow-production'):
+        call_command('benchmark_api')
@@ -0,0 +1,141 @@
+import pytest
+
+from api import utils
+from core.constants import BULK_IDS_MAX_LENGTH
+from recipes.models import (
+    FavoriteRecipe, Recipe, ShoppingCartIngredient, Subscription, User
+)
+from recipes.utils import reconcile_counters
+
+MISSING_ID = 10 ** 6
+
+
+def statuses(response):
+    assert response.status_code == 200, response.data
+    return {item['id']: item['status'] for item in response.data}
+
+
+@pytest.mark.django_db
+def test_bulk_favorite(dataset, user_client):
+    author = dataset.create_author()
+    favorite, *others = [dataset.create_recipe(author) for _ in range(3)]
+    FavoriteRecipe.objects.create(user=dataset.user, recipe=favorite)
+    response = user_client.post('/api/recipes/favorite/', {
+        'ids': [recipe.id for recipe in others] + [favorite.id, MISSING_ID]
+    }, format='json')
+    assert statuses(response) == {
+        **{recipe.id: 'created' for recipe in others},
+        favorite.id: 'exists', MISSING_ID: 'not_found'
+    }
+    assert FavoriteRecipe.objects.filter(user=dataset.user).count() == 3
+    assert set(Recipe.objects.filter(author=author).values_list(
+        'favorites_count', flat=True
+    )) == {0, 1}
+    response = user_client.delete('/api/recipes/favorite/', {
+        'ids': [favorite.id, favorite.id, MISSING_ID]
+    }, format='json')
+    assert response.data == [
+        {'id': favorite.id, 'status': 'deleted'},
+        {'id': MISSING_ID, 'status': 'not_found'},
+    ]
+    assert Recipe.objects.get(pk=favorite.pk).favorites_count == 0
+    response = user_client.delete(
+        '/api/recipes/favorite/', {'ids': [favorite.id]}, format='json'
+    )
+    assert statuses(response) == {favorite.id: 'absent'}
+    assert not any(reconcile_counters(check=True).values())
+
+
+@pytest.mark.django_db
+def test_bulk_favorite_retries_concurrent_insert(
+    dataset, user_client, monkeypatch
+):
+    author = dataset.create_author()
+    recipes = [dataset.create_recipe(author) for _ in range(2)]
+    get_linked_objects = utils.get_linked_objects
+    checks = []
+
+    def stale_check(*args):
+        linked = get_linked_objects(*args)
+        if not checks:
+            # Первая проверка не видит связь, добавленную
+            # параллельным запросом.
+            linked[recipes[0].id] = False
+        checks.append(linked)
+        return linked
+
+    user_client.post(f'/api/recipes/{recipes[0].id}/favorite/')
+    monkeypatch.setattr(utils, 'get_linked_objects', stale_check)
+    response = user_client.post('/api/recipes/favorite/', {
+        'ids': [recipe.id for recipe in recipes]
+    }, format='json')
+    assert len(checks) == 2
+    assert statuses(response) == {
+        recipes[0].id: 'exists', recipes[1].id: 'created'
+    }
+    assert list(Recipe.objects.filter(pk__in=checks[0]).values_list(
+        'favorites_count', flat=True
+    )) == [1, 1]
+    assert not any(reconcile_counters(check=True).values())
+
+
+@pytest.mark.django_db
+def test_bulk_shopping_cart_refreshes_ingredients(dataset, user_client):
+    author = dataset.create_author()
+    recipes = [dataset.create_recipe(author) for _ in range(2)]
+    ids = {'ids': [recipe.id for recipe in recipes]}
+    response = user_client.post(
+        '/api/recipes/shopping_cart/', ids, format='json'
+    )
+    assert set(statuses(response).values()) == {'created'}
+    assert dict(ShoppingCartIngredient.objects.filter(
+        user=dataset.user
+    ).values_list('ingredient_id', 'total_amount')) == {
+        ingredient.id: 20 for ingredient in dataset.ingredients[:2]
+    }
+    response = user_client.delete(
+        '/api/recipes/shopping_cart/', ids, format='json'
+    )
+    assert set(statuses(response).values()) == {'deleted'}
+    assert not ShoppingCartIngredient.objects.filter(
+        user=dataset.user
+    ).exists()
+
+
+@pytest.mark.django_db
+def test_bulk_subscribe(dataset, user_client):
+    authors = [dataset.create_user() for _ in range(2)]
+    ids = {'ids': [author.id for author in authors] + [dataset.user.id]}
+    response = user_client.post('/api/users/subscribe/', ids, format='json')
+    assert statuses(response) == {
+        **{author.id: 'created' for author in authors},
+        dataset.user.id: 'forbidden'
+    }
+    assert set(User.objects.filter(
+        pk__in=ids['ids']
+    ).values_list('subscribers_count', flat=True)) == {1, 0}
+    response = user_client.delete('/api/users/subscribe/', ids, format='json')
+    assert statuses(response) == {
+        **{author.id: 'deleted' for author in authors},
+        dataset.user.id: 'absent'
+    }
+    assert not Subscription.objects.exists()
+    assert not any(reconcile_counters(check=True).values())
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('data', (
+    {}, {'ids': []}, {'ids': ['id']}, {'ids': [0]},
+    {'ids': list(range(1, BULK_IDS_MAX_LENGTH + 2))},
+))
+def test_bulk_links_validate_ids(data, user_client):
+    response = user_client.post('/api/recipes/favorite/', data, format='json')
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_bulk_links_require_authentication(client):
+    response = client.post(
+        '/api/recipes/shopping_cart/', {'ids': [1]}, format='json'
+    )
+    assert response.status_code == 401
@@ -0,0 +1,56 @@
+import pytest
+
+from recipes.models import FavoriteRecipe, Recipe, Subscription, User
+from recipes.utils import delete_links, reconcile_counters
+from .conftest import IMAGE, PASSWORD
+
+
+@pytest.mark.django_db
+def test_avatar_update_keeps_subscribers_count(dataset, user_client):
+    Subscription.objects.create(
+        user=dataset.create_user(), author=dataset.user
+    )
+    response = user_client.put(
+        '/api/users/me/avatar/', {'avatar': IMAGE}, format='json'
+    )
+    assert response.status_code == 200
+    assert User.objects.get(pk=dataset.user.pk).subscribers_count == 1
+
+
+@pytest.mark.django_db
+def test_set_password_keeps_recipes_count(dataset, user_client):
+    dataset.create_recipe(dataset.user)
+    response = user_client.post('/api/users/set_password/', {
+        'current_password': PASSWORD, 'new_password': 'New-password-456'
+    })
+    assert response.status_code == 204
+    assert User.objects.get(pk=dataset.user.pk).recipes_count == 1
+
+
+@pytest.mark.django_db
+def test_recipe_save_keeps_favorites_count(dataset):
+    recipe = dataset.create_recipe(dataset.user)
+    stale = Recipe.objects.get(pk=recipe.pk)
+    FavoriteRecipe.objects.create(user=dataset.create_user(), recipe=recipe)
+    stale.name = 'Новое название'
+    stale.save()
+    assert Recipe.objects.get(pk=recipe.pk).favorites_count == 1
+    assert not any(reconcile_counters(check=True).values())
+
+
+@pytest.mark.django_db
+def test_explicit_recomputation_is_scoped_to_delete_links(dataset):
+    recipes = [dataset.create_recipe(dataset.user) for _ in range(2)]
+    links = [
+        FavoriteRecipe.objects.create(user=dataset.user, recipe=recipe)
+        for recipe in recipes
+    ]
+    delete_links(
+        FavoriteRecipe.objects.filter(user=dataset.user), 'recipe',
+        [recipes[0].id]
+    )
+    links[1].delete()
+    assert list(Recipe.objects.filter(
+        pk__in=[recipe.pk for recipe in recipes]
+    ).values_list('favorites_count', flat=True)) == [0, 0]
+    assert not any(reconcile_counters(check=True).values())
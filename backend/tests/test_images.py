@@ -0,0 +1,50 @@
+from io import BytesIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from api.images import downscale_image
+from core.constants import AVATAR_MAX_SIZE
+from recipes.models import Recipe
+
+
+def save_image(name, size):
+    buffer = BytesIO()
+    Image.new('RGB', size).save(buffer, 'PNG')
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def test_avatar_is_downscaled_in_place(isolated_storage):
+    width, height = AVATAR_MAX_SIZE
+    name = save_image('users/avatar.png', (width * 4, height * 2))
+    assert downscale_image(name, AVATAR_MAX_SIZE) == name
+    with default_storage.open(name) as file, Image.open(file) as image:
+        assert (image.format, image.size) == ('PNG', (width, height // 2))
+
+
+def test_small_avatar_is_kept(isolated_storage):
+    name = save_image('users/avatar.png', (10, 10))
+    assert downscale_image(name, AVATAR_MAX_SIZE) is None
+
+
+@pytest.mark.django_db
+def test_recipe_delete_removes_image_variants(
+    dataset, user_client, django_capture_on_commit_callbacks
+):
+    recipe = dataset.create_recipe(dataset.user)
+    variants = {
+        variant: default_storage.save(
+            f'recipes/images/variants/test_{variant}.webp',
+            ContentFile(b'webp')
+        )
+        for variant in ('small', 'medium')
+    }
+    Recipe.objects.filter(pk=recipe.pk).update(image_variants=variants)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.delete(f'/api/recipes/{recipe.id}/')
+    assert response.status_code == 204
+    assert not any(
+        default_storage.exists(name) for name in variants.values()
+    )
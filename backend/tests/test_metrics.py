@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient, Client
+
+from api.metrics import metrics
+from api.middleware import count_query, install_query_counter
+from core.constants import METRICS_QUERY_BUDGETS
+from .conftest import QueryLog
+
+TOKEN = 'metrics-token'
+
+
+@pytest.mark.parametrize('token, remote_addr, headers, status', (
+    ('', '127.0.0.1', {}, 200),
+    ('', '10.0.0.5', {}, 403),
+    (TOKEN, '10.0.0.5', {'Authorization': f'Bearer {TOKEN}'}, 200),
+    (TOKEN, '127.0.0.1', {}, 403),
+    (TOKEN, '10.0.0.5', {'Authorization': 'Bearer wrong'}, 403),
+))
+def test_metrics_access(token, remote_addr, headers, status, settings):
+    settings.METRICS_TOKEN = token
+    response = Client(REMOTE_ADDR=remote_addr).get(
+        '/metrics/', headers=headers
+    )
+    assert response.status_code == status
+
+
+@pytest.mark.django_db
+def test_query_budget_counts_only_reads(dataset, user_client, monkeypatch):
+    monkeypatch.setitem(METRICS_QUERY_BUDGETS, 'recipe-detail', 0)
+    recipe = dataset.create_recipe(dataset.user)
+    exceeded = metrics.counters['foodgram_query_budget_exceeded_total']
+    labels = (('route', 'recipe-detail'),)
+    before = exceeded.get(labels, 0)
+    assert user_client.get(f'/api/recipes/{recipe.id}/').status_code == 200
+    assert exceeded.get(labels, 0) == before + 1
+    assert user_client.delete(f'/api/recipes/{recipe.id}/').status_code == 204
+    assert exceeded.get(labels, 0) == before + 1
+
+
+def recorded_queries(route):
+    series = metrics.histograms['foodgram_request_queries'].get(
+        (('route', route), ('method', 'GET')), [None, 0, 0]
+    )
+    return series[1], series[2]
+
+
+@pytest.mark.django_db
+def test_concurrent_async_requests_count_own_queries(dataset):
+    dataset.grow(2)
+    url = '/api/recipes/'
+    async_to_sync(AsyncClient().get)(url)
+    total = recorded_queries('recipe-list')[0]
+    async_to_sync(AsyncClient().get)(url)
+    single = recorded_queries('recipe-list')[0] - total
+    assert single > 0
+
+    async def get_concurrently():
+        client = AsyncClient()
+        return await asyncio.gather(*(client.get(url) for _ in range(10)))
+
+    total, count = recorded_queries('recipe-list')
+    responses = async_to_sync(get_concurrently)()
+    assert {response.status_code for response in responses} == {200}
+    assert recorded_queries('recipe-list') == (
+        total + 10 * single, count + 10
+    )
+
+
+def test_query_counter_keeps_outer_execute_wrapper():
+    outer = connection.execute_wrappers.copy()
+    connection.execute_wrappers.clear()
+    try:
+        # Соединение открывается во время замера запросов в тестах.
+        with connection.execute_wrapper(QueryLog()):
+            install_query_counter(connection)
+        assert connection.execute_wrappers == [count_query]
+    finally:
+        connection.execute_wrappers[:] = outer
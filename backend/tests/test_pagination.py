@@ -0,0 +1,54 @@
+import json
+from base64 import urlsafe_b64encode
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.pagination import CursorLimitPagination
+from recipes.models import Recipe
+
+
+def encode(payload):
+    return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('cursor', (
+    'not-base64!',
+    encode([5, False]),
+    encode({'position': [1], 'reverse': False}),
+    encode([['2020-01-01T00:00:00', 1], 'yes']),
+    encode([['вчера', 1], False]),
+    encode([['2020-01-01T00:00:00', 'один'], False]),
+    encode([['2020-01-01T00:00:00'], False]),
+    encode([[None, 1], False]),
+))
+def test_tampered_cursor_returns_not_found(cursor, dataset, client):
+    dataset.grow(1)
+    response = client.get('/api/recipes/', {'cursor': cursor})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_cursor_pages_cover_every_recipe(dataset, client):
+    dataset.grow(2)
+    ids = []
+    url = '/api/recipes/?cursor=&limit=2&ordering=-favorites_count'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        ids += [recipe['id'] for recipe in response.data['results']]
+        url = response.data['next']
+    assert sorted(ids) == sorted(recipe.id for recipe in dataset.recipes)
+
+
+@pytest.mark.django_db
+def test_cursor_rejects_expression_ordering():
+    request = Request(APIRequestFactory().get('/api/recipes/?cursor='))
+    with pytest.raises(ImproperlyConfigured):
+        CursorLimitPagination().paginate_queryset(
+            Recipe.objects.order_by(F('pub_date').desc()), request
+        )
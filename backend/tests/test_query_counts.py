@@ -0,0 +1,412 @@
+"""Количество SQL запросов каждого эндпоинта API не должно зависеть
+от объема данных и превышать бюджет эндпоинта.
+
+Каждый эндпоинт замеряется дважды: на небольшом наборе данных
+и после его увеличения. Страница списка, рецепт и корзина при этом
+содержат больше объектов, поэтому запросы в цикле (N+1) меняют
+количество SQL запросов.
+"""
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Subscription, FavoriteRecipe, ShoppingCart
+from .conftest import (
+    IMAGE, PASSWORD, SIZES, check_query_count, measure
+)
+
+
+def recipe_data(dataset):
+    return {
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 10}
+            for ingredient in dataset.ingredients[:3]
+        ],
+        'tags': [tag.id for tag in dataset.tags[-2:]],
+        'image': IMAGE,
+        'name': 'Новый рецепт',
+        'text': 'Описание',
+        'cooking_time': 5,
+    }
+
+
+def user_list(client, user_client, dataset):
+    return lambda: user_client.get('/api/users/')
+
+
+def user_detail(client, user_client, dataset):
+    return lambda: user_client.get(f'/api/users/{dataset.authors[0].id}/')
+
+
+def user_me(client, user_client, dataset):
+    return lambda: user_client.get('/api/users/me/')
+
+
+def user_create(client, user_client, dataset):
+    number = next(dataset.numbers)
+    return lambda: client.post('/api/users/', {
+        'email': f'new-{number}@example.com', 'username': f'new-{number}',
+        'first_name': 'Имя', 'last_name': 'Фамилия', 'password': PASSWORD
+    })
+
+
+def user_set_password(client, user_client, dataset):
+    client.force_authenticate(dataset.create_user(password=PASSWORD))
+    return lambda: client.post('/api/users/set_password/', {
+        'new_password': f'{PASSWORD}-new', 'current_password': PASSWORD
+    })
+
+
+def user_avatar(client, user_client, dataset):
+    return lambda: user_client.put(
+        '/api/users/me/avatar/', {'avatar': IMAGE}, format='json'
+    )
+
+
+def user_delete_avatar(client, user_client, dataset):
+    return lambda: user_client.delete('/api/users/me/avatar/')
+
+
+def user_subscriptions(client, user_client, dataset):
+    return lambda: user_client.get(
+        '/api/users/subscriptions/?recipes_limit=2'
+    )
+
+
+def user_subscribe(client, user_client, dataset):
+    author = dataset.create_author()
+    return lambda: user_client.post(
+        f'/api/users/{author.id}/subscribe/?recipes_limit=2'
+    )
+
+
+def user_unsubscribe(client, user_client, dataset):
+    author = dataset.create_author()
+    Subscription.objects.create(user=dataset.user, author=author)
+    return lambda: user_client.delete(f'/api/users/{author.id}/subscribe/')
+
+
+def bulk_ids(objects):
+    return {'ids': [obj.id for obj in objects] + [10 ** 6]}
+
+
+def new_recipes(dataset):
+    return [
+        dataset.create_recipe(dataset.authors[0])
+        for _ in range(dataset.size + 1)
+    ]
+
+
+def user_bulk_subscribe(client, user_client, dataset):
+    authors = [dataset.create_author() for _ in range(dataset.size + 1)]
+    return lambda: user_client.post(
+        '/api/users/subscribe/',
+        bulk_ids([*authors, dataset.authors[-1], dataset.user]),
+        format='json'
+    )
+
+
+def user_bulk_unsubscribe(client, user_client, dataset):
+    authors = [dataset.create_author() for _ in range(dataset.size + 1)]
+    Subscription.objects.bulk_create(
+        Subscription(user=dataset.user, author=author) for author in authors
+    )
+    return lambda: user_client.delete(
+        '/api/users/subscribe/', bulk_ids(authors), format='json'
+    )
+
+
+def token_login(client, user_client, dataset):
+    user = dataset.create_user(password=PASSWORD)
+    return lambda: client.post('/api/auth/token/login/', {
+        'email': user.email, 'password': PASSWORD
+    })
+
+
+def token_logout(client, user_client, dataset):
+    token = Token.objects.create(user=dataset.create_user())
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return lambda: client.post('/api/auth/token/logout/')
+
+
+def token_cache_stats(client, user_client, dataset):
+    client.force_authenticate(dataset.create_user(is_staff=True))
+    return lambda: client.get('/api/auth/token/cache-stats/')
+
+
+def tag_list(client, user_client, dataset):
+    return lambda: client.get('/api/tags/')
+
+
+def tag_detail(client, user_client, dataset):
+    return lambda: client.get(f'/api/tags/{dataset.tags[0].id}/')
+
+
+def ingredient_list(client, user_client, dataset):
+    return lambda: client.get('/api/ingredients/')
+
+
+def ingredient_search(client, user_client, dataset):
+    return lambda: client.get('/api/ingredients/?name=ингр')
+
+
+def ingredient_detail(client, user_client, dataset):
+    return lambda: client.get(
+        f'/api/ingredients/{dataset.ingredients[0].id}/'
+    )
+
+
+def recipe_list_anonymous(client, user_client, dataset):
+    return lambda: client.get('/api/recipes/')
+
+
+def recipe_list(client, user_client, dataset):
+    return lambda: user_client.get('/api/recipes/')
+
+
+def recipe_list_filtered(client, user_client, dataset):
+    return lambda: user_client.get(
+        '/api/recipes/?is_favorited=1&is_in_shopping_cart=1'
+        f'&tags={dataset.tags[0].slug}'
+    )
+
+
+def recipe_list_search(client, user_client, dataset):
+    return lambda: user_client.get('/api/recipes/?search=ингредиент')
+
+
+def recipe_list_author(client, user_client, dataset):
+    return lambda: user_client.get(
+        f'/api/recipes/?author={dataset.authors[-1].id}'
+    )
+
+
+def recipe_list_cursor(client, user_client, dataset):
+    cursor = user_client.get('/api/recipes/?limit=1&cursor=').data['next']
+    return lambda: user_client.get(cursor)
+
+
+def recipe_detail(client, user_client, dataset):
+    return lambda: user_client.get(f'/api/recipes/{dataset.recipes[-1].id}/')
+
+
+def recipe_get_link(client, user_client, dataset):
+    return lambda: client.get(
+        f'/api/recipes/{dataset.recipes[-1].id}/get-link/'
+    )
+
+
+def recipe_create(client, user_client, dataset):
+    return lambda: user_client.post(
+        '/api/recipes/', recipe_data(dataset), format='json'
+    )
+
+
+def recipe_create_many_ingredients(client, user_client, dataset):
+    data = recipe_data(dataset)
+    data['ingredients'] = [
+        {'id': ingredient.id, 'amount': 10}
+        for ingredient in dataset.ingredients[:dataset.size * 5]
+    ]
+    return lambda: user_client.post('/api/recipes/', data, format='json')
+
+
+def recipe_update(client, user_client, dataset):
+    recipe = dataset.create_recipe(dataset.user)
+    ShoppingCart.objects.create(user=dataset.user, recipe=recipe)
+    # Одно количество меняется, один ингредиент добавляется,
+    # остальные удаляются.
+    data = recipe_data(dataset)
+    data['ingredients'] = [
+        {'id': dataset.ingredients[0].id, 'amount': 20},
+        {'id': dataset.ingredients[-1].id, 'amount': 10},
+    ]
+    return lambda: user_client.patch(
+        f'/api/recipes/{recipe.id}/', data, format='json'
+    )
+
+
+def recipe_update_text(client, user_client, dataset):
+    recipe = dataset.create_recipe(dataset.user)
+    ShoppingCart.objects.create(user=dataset.user, recipe=recipe)
+    # Теги проверяются запросом на каждый, поэтому их число постоянно.
+    tags = dataset.tags[-2:]
+    recipe.tags.set(tags)
+    data = {
+        'ingredients': [
+            {'id': row.ingredient_id, 'amount': row.amount}
+            for row in recipe.recipe_ingredients.all()
+        ],
+        'tags': [tag.id for tag in tags],
+        'text': 'Новое описание',
+    }
+    return lambda: user_client.patch(
+        f'/api/recipes/{recipe.id}/', data, format='json'
+    )
+
+
+def recipe_delete(client, user_client, dataset):
+    recipe = dataset.create_recipe(dataset.user)
+    ShoppingCart.objects.create(user=dataset.user, recipe=recipe)
+    return lambda: user_client.delete(f'/api/recipes/{recipe.id}/')
+
+
+def recipe_favorite(client, user_client, dataset):
+    recipe = dataset.create_recipe(dataset.authors[0])
+    return lambda: user_client.post(f'/api/recipes/{recipe.id}/favorite/')
+
+
+def recipe_delete_favorite(client, user_client, dataset):
+    recipe = dataset.create_recipe(dataset.authors[0])
+    FavoriteRecipe.objects.create(user=dataset.user, recipe=recipe)
+    return lambda: user_client.delete(f'/api/recipes/{recipe.id}/favorite/')
+
+
+def recipe_shopping_cart(client, user_client, dataset):
+    recipe = dataset.create_recipe(dataset.authors[0])
+    return lambda: user_client.post(
+        f'/api/recipes/{recipe.id}/shopping_cart/'
+    )
+
+
+def recipe_delete_shopping_cart(client, user_client, dataset):
+    recipe = dataset.create_recipe(dataset.authors[0])
+    ShoppingCart.objects.create(user=dataset.user, recipe=recipe)
+    return lambda: user_client.delete(
+        f'/api/recipes/{recipe.id}/shopping_cart/'
+    )
+
+
+def recipe_bulk_favorite(client, user_client, dataset):
+    recipes = new_recipes(dataset)
+    return lambda: user_client.post(
+        '/api/recipes/favorite/', bulk_ids([*recipes, dataset.recipes[-1]]),
+        format='json'
+    )
+
+
+def recipe_bulk_delete_favorite(client, user_client, dataset):
+    recipes = new_recipes(dataset)
+    FavoriteRecipe.objects.bulk_create(
+        FavoriteRecipe(user=dataset.user, recipe=recipe) for recipe in recipes
+    )
+    return lambda: user_client.delete(
+        '/api/recipes/favorite/', bulk_ids(recipes), format='json'
+    )
+
+
+def recipe_bulk_shopping_cart(client, user_client, dataset):
+    recipes = new_recipes(dataset)
+    return lambda: user_client.post(
+        '/api/recipes/shopping_cart/',
+        bulk_ids([*recipes, dataset.recipes[-1]]), format='json'
+    )
+
+
+def recipe_bulk_delete_shopping_cart(client, user_client, dataset):
+    recipes = new_recipes(dataset)
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=dataset.user, recipe=recipe) for recipe in recipes
+    )
+    return lambda: user_client.delete(
+        '/api/recipes/shopping_cart/', bulk_ids(recipes), format='json'
+    )
+
+
+def download_shopping_cart(export_format):
+    def case(client, user_client, dataset):
+        return lambda: user_client.get(
+            f'/api/recipes/download_shopping_cart/?format={export_format}'
+        )
+    return case
+
+
+# Эндпоинт, ожидаемый статус ответа и бюджет SQL запросов.
+CASES = {
+    'user-list': (user_list, 200, 2),
+    'user-detail': (user_detail, 200, 1),
+    'user-me': (user_me, 200, 1),
+    'user-create': (user_create, 201, 5),
+    'user-set-password': (user_set_password, 204, 1),
+    'user-avatar': (user_avatar, 200, 2),
+    'user-delete-avatar': (user_delete_avatar, 204, 0),
+    'user-subscriptions': (user_subscriptions, 200, 3),
+    'user-subscribe': (user_subscribe, 201, 8),
+    'user-unsubscribe': (user_unsubscribe, 204, 4),
+    'user-bulk-subscribe': (user_bulk_subscribe, 200, 5),
+    'user-bulk-unsubscribe': (user_bulk_unsubscribe, 200, 6),
+    'token-login': (token_login, 200, 6),
+    'token-logout': (token_logout, 204, 4),
+    'token-cache-stats': (token_cache_stats, 200, 0),
+    'tag-list': (tag_list, 200, 1),
+    'tag-detail': (tag_detail, 200, 1),
+    'ingredient-list': (ingredient_list, 200, 1),
+    'ingredient-search': (ingredient_search, 200, 1),
+    'ingredient-detail': (ingredient_detail, 200, 1),
+    'recipe-list-anonymous': (recipe_list_anonymous, 200, 5),
+    'recipe-list': (recipe_list, 200, 5),
+    'recipe-list-filtered': (recipe_list_filtered, 200, 6),
+    'recipe-list-search': (recipe_list_search, 200, 6),
+    'recipe-list-author': (recipe_list_author, 200, 6),
+    'recipe-list-cursor': (recipe_list_cursor, 200, 4),
+    'recipe-detail': (recipe_detail, 200, 4),
+    'recipe-get-link': (recipe_get_link, 200, 1),
+    'recipe-create': (recipe_create, 201, 21),
+    'recipe-create-many-ingredients': (
+        recipe_create_many_ingredients, 201, 21
+    ),
+    'recipe-update': (recipe_update, 200, 28),
+    'recipe-update-text': (recipe_update_text, 200, 14),
+    'recipe-delete': (recipe_delete, 204, 18),
+    'recipe-favorite': (recipe_favorite, 201, 6),
+    'recipe-delete-favorite': (recipe_delete_favorite, 204, 4),
+    'recipe-shopping-cart': (recipe_shopping_cart, 201, 12),
+    'recipe-delete-shopping-cart': (recipe_delete_shopping_cart, 204, 10),
+    'recipe-bulk-favorite': (recipe_bulk_favorite, 200, 5),
+    'recipe-bulk-delete-favorite': (recipe_bulk_delete_favorite, 200, 6),
+    'recipe-bulk-shopping-cart': (recipe_bulk_shopping_cart, 200, 10),
+    'recipe-bulk-delete-shopping-cart': (
+        recipe_bulk_delete_shopping_cart, 200, 12
+    ),
+    'download-shopping-cart-txt': (download_shopping_cart('txt'), 200, 2),
+    'download-shopping-cart-csv': (download_shopping_cart('csv'), 200, 2),
+    'download-shopping-cart-pdf': (download_shopping_cart('pdf'), 200, 2),
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', CASES)
+def test_query_count(name, dataset, user_client):
+    case, expected_status, budget = CASES[name]
+    check_query_count(
+        name, dataset, lambda: case(APIClient(), user_client, dataset),
+        expected_status, budget
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('case, budget', (
+    (recipe_list, 2), (recipe_list_author, 3), (recipe_detail, 1)
+))
+def test_cached_recipe_representation(case, budget, dataset, user_client):
+    """Повторный запрос берет общие части рецептов из кэша, поля
+    пользователя вычисляются в запросе страницы.
+    """
+    dataset.grow(SIZES[-1])
+    request = case(APIClient(), user_client, dataset)
+    cold, _ = measure(request)
+    warm, log = measure(request, clear_cache=False)
+    assert warm.data == cold.data
+    assert len(log) <= budget, (
+        f'{len(log)} SQL запросов при бюджете {budget}\n{log.report()}'
+    )
+    other_client = APIClient()
+    other_client.force_authenticate(dataset.create_user())
+    other, _ = measure(
+        case(APIClient(), other_client, dataset), clear_cache=False
+    )
+    recipes = other.data.get('results', [other.data])
+    assert recipes and not any(
+        recipe['is_favorited'] or recipe['is_in_shopping_cart']
+        or recipe['author']['is_subscribed'] for recipe in recipes
+    )
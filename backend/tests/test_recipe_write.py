@@ -0,0 +1,75 @@
+import pytest
+
+from recipes.models import IngredientRecipe, ShoppingCart
+from .test_query_counts import recipe_data
+
+
+def recipe_rows(recipe):
+    return {
+        row.ingredient_id: (row.pk, row.amount)
+        for row in IngredientRecipe.objects.filter(recipe=recipe)
+    }
+
+
+@pytest.mark.django_db
+def test_update_changes_only_different_ingredients(dataset, user_client):
+    dataset.size = 2
+    recipe = dataset.create_recipe(dataset.user)
+    ShoppingCart.objects.create(user=dataset.user, recipe=recipe)
+    kept, changed, removed = dataset.ingredients[:3]
+    added = dataset.ingredients[-1]
+    before = recipe_rows(recipe)
+    data = recipe_data(dataset)
+    data['ingredients'] = [
+        {'id': kept.id, 'amount': 10},
+        {'id': changed.id, 'amount': 25},
+        {'id': added.id, 'amount': 5},
+    ]
+    response = user_client.patch(
+        f'/api/recipes/{recipe.id}/', data, format='json'
+    )
+    assert response.status_code == 200
+    after = recipe_rows(recipe)
+    assert after.keys() == {kept.id, changed.id, added.id}
+    assert after[kept.id] == before[kept.id]
+    assert after[changed.id] == (before[changed.id][0], 25)
+    assert after[added.id][1] == 5
+    assert {
+        ingredient['id']: ingredient['amount']
+        for ingredient in response.data['ingredients']
+    } == {kept.id: 10, changed.id: 25, added.id: 5}
+    assert dict(dataset.user.cart_ingredients.values_list(
+        'ingredient_id', 'total_amount'
+    )) == {kept.id: 10, changed.id: 25, added.id: 5}
+    search = user_client.get(
+        '/api/recipes/', {'search': added.name.split()[-1]}
+    )
+    assert [item['id'] for item in search.data['results']] == [recipe.id]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('field', ('ingredients', 'tags'))
+def test_partial_update_requires_ingredients_and_tags(
+    field, dataset, user_client
+):
+    recipe = dataset.create_recipe(dataset.user)
+    data = recipe_data(dataset)
+    del data[field]
+    response = user_client.patch(
+        f'/api/recipes/{recipe.id}/', data, format='json'
+    )
+    assert response.status_code == 400
+    assert list(response.data) == [field]
+
+
+@pytest.mark.django_db
+def test_missing_ingredients_are_reported_together(dataset, user_client):
+    data = recipe_data(dataset)
+    data['ingredients'] += [
+        {'id': 10 ** 6, 'amount': 1}, {'id': 10 ** 6 + 1, 'amount': 1}
+    ]
+    response = user_client.post('/api/recipes/', data, format='json')
+    assert response.status_code == 400
+    assert response.data == {'ingredients': [
+        f'Не существуют ингредиенты: {10 ** 6}, {10 ** 6 + 1}'
+    ]}
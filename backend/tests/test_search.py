@@ -0,0 +1,71 @@
+import pytest
+
+from recipes.models import Ingredient, IngredientRecipe, Recipe
+
+
+def search(client, query, **params):
+    response = client.get('/api/recipes/', {'search': query, **params})
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+@pytest.fixture
+def recipes(dataset):
+    dataset.grow(1)
+    author = dataset.authors[0]
+    by_name = dataset.create_recipe(author)
+    by_name.name = 'Борщ украинский'
+    by_name.save()
+    by_text = dataset.create_recipe(author)
+    by_text.text = 'Подавать как борщ, со сметаной'
+    by_text.save()
+    by_ingredient = dataset.create_recipe(author)
+    beet = Ingredient.objects.create(name='свекла', measurement_unit='г')
+    IngredientRecipe.objects.create(
+        recipe=by_ingredient, ingredient=beet, amount=1
+    )
+    return by_name, by_text, by_ingredient
+
+
+@pytest.mark.django_db
+def test_search_ranks_name_above_text(recipes, client):
+    by_name, by_text, _ = recipes
+    assert search(client, 'борщ') == [by_name.id, by_text.id]
+
+
+@pytest.mark.django_db
+def test_search_by_ingredient_name(recipes, client):
+    _, _, by_ingredient = recipes
+    assert search(client, 'свекла') == [by_ingredient.id]
+    Ingredient.objects.filter(name='свекла').get().delete()
+    assert search(client, 'свекла') == []
+
+
+@pytest.mark.django_db
+def test_search_follows_changes(recipes, client):
+    by_name, by_text, _ = recipes
+    by_name.name = 'Щи'
+    by_name.save()
+    Recipe.objects.get(pk=by_text.pk).delete()
+    assert search(client, 'борщ') == []
+    assert search(client, 'щи') == [by_name.id]
+
+
+@pytest.mark.django_db
+def test_search_with_ordering_and_cursor(recipes, client):
+    by_name, by_text, _ = recipes
+    assert search(client, 'борщ', ordering='-pub_date') == [
+        by_text.id, by_name.id
+    ]
+    first_page = client.get(
+        '/api/recipes/', {'search': 'борщ', 'cursor': '', 'limit': 1}
+    ).data
+    assert [recipe['id'] for recipe in first_page['results']] == [by_name.id]
+    second_page = client.get(first_page['next']).data
+    assert [recipe['id'] for recipe in second_page['results']] == [by_text.id]
+
+
+@pytest.mark.django_db
+def test_search_ignores_query_syntax(recipes, client):
+    assert search(client, '"борщ" OR NOT*') == []
+    assert search(client, '!!!') == []
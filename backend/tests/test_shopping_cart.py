@@ -0,0 +1,93 @@
+import pytest
+
+from recipes.models import (
+    IngredientRecipe, Recipe, ShoppingCart, ShoppingCartIngredient, User
+)
+
+
+def cart_totals(user):
+    return dict(ShoppingCartIngredient.objects.filter(
+        user=user
+    ).values_list('ingredient_id', 'total_amount'))
+
+
+@pytest.fixture
+def cart(dataset):
+    """Два рецепта разных авторов в корзине пользователя: первый
+    ингредиент есть в обоих рецептах.
+    """
+    dataset.size = 0
+    first_author, second_author = dataset.create_user(), dataset.create_user()
+    first = dataset.create_recipe(first_author)
+    second = dataset.create_recipe(second_author)
+    IngredientRecipe.objects.filter(recipe=second).update(amount=5)
+    for recipe in (first, second):
+        ShoppingCart.objects.create(user=dataset.user, recipe=recipe)
+    first_ingredient, second_ingredient = dataset.ingredients[:2]
+    assert cart_totals(dataset.user) == {
+        first_ingredient.id: 15, second_ingredient.id: 15
+    }
+    return first, second
+
+
+@pytest.mark.django_db
+def test_cart_follows_author_deletion(cart, dataset):
+    first, second = cart
+    first.author.delete()
+    assert cart_totals(dataset.user) == {
+        ingredient.id: 5 for ingredient in dataset.ingredients[:2]
+    }
+
+
+@pytest.mark.django_db
+def test_cart_follows_queryset_deletion(cart, dataset):
+    first, second = cart
+    Recipe.objects.filter(pk=second.pk).delete()
+    assert cart_totals(dataset.user) == {
+        ingredient.id: 10 for ingredient in dataset.ingredients[:2]
+    }
+    ShoppingCart.objects.all().delete()
+    assert cart_totals(dataset.user) == {}
+
+
+@pytest.mark.django_db
+def test_cart_follows_recipe_ingredient_changes(cart, dataset):
+    first, second = cart
+    first_ingredient, second_ingredient = dataset.ingredients[:2]
+    third_ingredient = dataset.ingredients[2]
+    ingredient_recipe = IngredientRecipe.objects.get(
+        recipe=first, ingredient=second_ingredient
+    )
+    ingredient_recipe.ingredient = third_ingredient
+    ingredient_recipe.amount = 7
+    ingredient_recipe.save()
+    assert cart_totals(dataset.user) == {
+        first_ingredient.id: 15, second_ingredient.id: 5,
+        third_ingredient.id: 7
+    }
+    IngredientRecipe.objects.get(
+        recipe=second, ingredient=first_ingredient
+    ).delete()
+    assert cart_totals(dataset.user) == {
+        first_ingredient.id: 10, second_ingredient.id: 5,
+        third_ingredient.id: 7
+    }
+
+
+@pytest.mark.django_db
+def test_cart_owner_deletion_keeps_other_carts(cart, dataset):
+    first, _ = cart
+    other = dataset.create_user()
+    ShoppingCart.objects.create(user=other, recipe=first)
+    User.objects.filter(pk=dataset.user.pk).delete()
+    assert cart_totals(other) == {
+        ingredient.id: 10 for ingredient in dataset.ingredients[:2]
+    }
+
+
+@pytest.mark.django_db
+def test_download_after_author_deletion(cart, dataset, user_client):
+    for recipe in cart:
+        recipe.author.delete()
+    response = user_client.get('/api/recipes/download_shopping_cart/')
+    assert response.status_code == 400
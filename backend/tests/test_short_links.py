@@ -0,0 +1,47 @@
+import pytest
+from django.urls import resolve
+
+from api.short_links import decode_short_code, encode_short_code
+from recipes.models import Recipe
+from recipes.utils import get_model_version
+
+# Id рецепта, перемешанный код которого записывается одними цифрами.
+DIGITS_ONLY_PK = 889844093027
+
+
+@pytest.mark.parametrize('pk', (1, 42, 10 ** 7, DIGITS_ONLY_PK))
+def test_short_code_round_trip(pk):
+    code = encode_short_code(pk)
+    assert not code.isdigit()
+    assert decode_short_code(code) == pk
+
+
+@pytest.mark.parametrize('code', ('0000000', '1234567', 'zzzzzz!'))
+def test_decode_rejects_invalid_code(code):
+    assert decode_short_code(code) is None
+
+
+def test_seven_digit_pk_resolves_to_legacy_route():
+    match = resolve('/s/1234567/')
+    assert (match.url_name, match.kwargs) == (
+        'legacy_short_url', {'pk': 1234567}
+    )
+
+
+@pytest.mark.django_db
+def test_recipe_version_changes_on_create_and_delete_only(
+    dataset, django_capture_on_commit_callbacks
+):
+    recipe = dataset.create_recipe(dataset.user)
+    version = get_model_version(Recipe)
+    recipe.name = 'Новое название'
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.save()
+    assert get_model_version(Recipe) == version
+    with django_capture_on_commit_callbacks() as callbacks:
+        recipe.delete()
+    # Версия меняется только после фиксации транзакции.
+    assert get_model_version(Recipe) == version
+    for callback in callbacks:
+        callback()
+    assert get_model_version(Recipe) != version
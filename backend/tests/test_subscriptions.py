@@ -0,0 +1,40 @@
+import pytest
+
+from recipes.models import Subscription
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('recipes_limit, expected', (
+    ('', 3), ('0', 0), ('1', 1), ('5', 3),
+))
+def test_subscriptions_recipes_limit(recipes_limit, expected, dataset,
+                                     user_client):
+    dataset.grow(2)
+    response = user_client.get(
+        '/api/users/subscriptions/', {'recipes_limit': recipes_limit}
+    )
+    assert response.status_code == 200
+    assert [
+        len(author['recipes']) for author in response.data['results']
+    ] == [expected, expected]
+
+
+@pytest.mark.django_db
+def test_subscriptions_reject_invalid_recipes_limit(user_client):
+    response = user_client.get(
+        '/api/users/subscriptions/', {'recipes_limit': 'many'}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_subscriptions_keep_subscription_order(dataset, user_client):
+    # Порядок подписок отличается от порядка имен и id авторов.
+    authors = [dataset.create_user() for _ in range(3)][::-1]
+    for author in authors:
+        Subscription.objects.create(user=dataset.user, author=author)
+    response = user_client.get('/api/users/subscriptions/')
+    assert response.status_code == 200
+    assert [
+        author['id'] for author in response.data['results']
+    ] == [author.id for author in authors]
@@ -0,0 +1,19 @@
+import pytest
+
+from recipes.models import User
+from .conftest import PASSWORD
+
+
+@pytest.mark.django_db
+def test_user_create_returns_id(client):
+    response = client.post('/api/users/', {
+        'email': 'new@example.com', 'username': 'new-user',
+        'first_name': 'Имя', 'last_name': 'Фамилия', 'password': PASSWORD
+    })
+    assert response.status_code == 201
+    # Поля ответа из схемы Postman-коллекции (additionalProperties: false).
+    assert response.json() == {
+        'id': User.objects.get(username='new-user').id,
+        'email': 'new@example.com', 'username': 'new-user',
+        'first_name': 'Имя', 'last_name': 'Фамилия'
+    }